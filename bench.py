@@ -0,0 +1,323 @@
+"""Benchmarks for the reputation tracker on synthetic campaigns.
+
+    python bench.py run [--sizes 10x0-500,1000x0-50] [--backends json,db,snap] [--output bench.json]
+    python bench.py compare OLD.json NEW.json [--threshold 0.15]
+
+run records each backend's file size and times storage load (place headers
+only, and everything), save, single and bulk engine mutations and, when a
+display (or Xvfb for a virtual one) is available, both GUIs' startup (with
+its first paint, interactive and all rows milestones), save_data,
+refresh_display and edit handlers. compare prints the change of every
+shared result and exits with status 1 if any got slower than the threshold.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib
+import statistics
+import subprocess
+
+from storage import open_storage
+from engine import ReputationEngine
+
+DEFAULT_SIZES = "10x0-500,1000x0-50,10000x0-10"
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.15
+GUI_MODULES = ("reputation", "jashbda")
+
+SYLLABLES = ["ar", "bel", "cor", "dun", "el", "fen", "gar", "hol", "ith", "kar",
+             "lor", "mor", "nor", "or", "pel", "quin", "ros", "sar", "tor", "ul",
+             "val", "wyn", "xan", "yor", "zed"]
+
+
+def parse_size(text):
+    """Parse "PLACESxPEOPLE" where PEOPLE is a count or a "LOW-HIGH" range per place."""
+    places, people = text.lower().split("x")
+    low, _, high = people.partition("-")
+    return int(places), int(low), int(high or low)
+
+
+def random_name(rng, used):
+    while True:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        if name not in used:
+            used.add(name)
+            return name
+
+
+def generate_campaign(places, low, high, seed=0):
+    """Return a places dict in the reputation.json layout with random names and values."""
+    rng = random.Random(seed)
+    place_names = set()
+    campaign = {}
+    for _ in range(places):
+        person_names = set()
+        people = {}
+        for _ in range(rng.randint(low, high)):
+            people[random_name(rng, person_names)] = rng.randint(0, 100)
+        campaign[random_name(rng, place_names)] = {"reputation": rng.randint(0, 100), "people": people}
+    return campaign
+
+
+def write_campaign(campaign, path):
+    """Store a campaign through the backend chosen by the path's extension."""
+    storage = open_storage(path)
+    try:
+        storage.replace_all(campaign)
+    finally:
+        storage.close()
+
+
+def measure(fn, repeat, setup=None):
+    """Run fn repeat times and return timing stats in seconds; setup runs untimed before each call."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"median": statistics.median(times), "min": min(times), "runs": repeat}
+
+
+def bench_engine(path, repeat):
+    """Time storage load/save and engine mutations without any GUI."""
+    results = {}
+    storage = open_storage(path)
+    engine = ReputationEngine(storage.load_people)
+
+    def load():
+        engine.load(storage.load())
+        for place in engine.place_names():
+            engine.load_people(place)
+
+    results["load_headers"] = measure(storage.load, repeat)
+    results["load"] = measure(load, repeat)
+    results["save"] = measure(lambda: storage.snapshot(engine.to_dict()), repeat)
+
+    people = [(place, person) for place in engine.place_names() for person in engine.people(place)]
+    places = list(engine.place_names())
+    rng = random.Random(1)
+    targets = [rng.choice(people) for _ in range(1000)] if people else []
+
+    def single():
+        for place, person in targets:
+            engine.modify_person_reputation(place, person, 1)
+
+    if targets:
+        results["modify_person_x1000"] = measure(single, repeat)
+    results["bulk_people"] = measure(lambda: engine.apply_deltas([(place, person, -1) for place, person in people]),
+                                     repeat)
+    results["bulk_places"] = measure(lambda: engine.apply_deltas([(place, None, 1) for place in places]), repeat)
+
+    def write_batch():
+        records = []
+        engine.subscribe(records.append)
+        for place, person in targets:
+            engine.modify_person_reputation(place, person, 1)
+        engine.listeners.remove(records.append)
+        storage.write(records, engine.to_dict)
+
+    if targets:
+        results["write_1000_records"] = measure(write_batch, repeat)
+    storage.close()
+    return results
+
+
+def start_virtual_display():
+    """Make sure Tk has a display; start Xvfb if needed. Return (available, process or None)."""
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return True, None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return False, None
+    display = ":%d" % (90 + os.getpid() % 100)
+    process = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    if process.poll() is not None:
+        return False, None
+    os.environ["DISPLAY"] = display
+    return True, process
+
+
+def make_root(module_name):
+    if module_name == "jashbda":
+        import ttkbootstrap
+        return ttkbootstrap.Window(themename="darkly")
+    import tkinter
+    return tkinter.Tk()
+
+
+def bench_gui(module_name, path, repeat):
+    """Time one GUI's startup, save_data, refresh_display and edit handlers on a campaign."""
+    module = importlib.import_module(module_name)
+    directory = os.path.dirname(path)
+    module.FILE_PATH = path
+    module.RELATIONS_PATH = os.path.join(directory, "none.relations.json")
+    results = {}
+    apps = []
+    marks = {}
+
+    def fresh_history():
+        module.HISTORY_DIR = tempfile.mkdtemp(dir=directory)
+
+    def start():
+        root = make_root(module_name)
+        app = module.ReputationTrackerGUI(root)
+        # Data loads on a worker thread and rows fill in chunks; startup ends with the last chunk
+        while "all rows" not in app.startup.marks:
+            root.update()
+            time.sleep(0.001)
+        for name, seconds in app.startup.marks.items():
+            marks.setdefault(name, []).append(seconds)
+        apps.append((root, app))
+
+    def close():
+        while apps:
+            root, app = apps.pop()
+            app.saver.flush()
+            app.storage.close()
+            root.destroy()
+
+    def setup():
+        close()
+        fresh_history()
+
+    results["startup"] = measure(start, repeat, setup)
+    for name, times in marks.items():
+        results["startup_" + name.replace(" ", "_")] = {"median": statistics.median(times), "min": min(times),
+                                                        "runs": len(times)}
+    root, app = apps[-1]
+
+    def settled(fn):
+        # Include the redraw Tk does once the handler returns
+        def timed():
+            fn()
+            root.update()
+        return timed
+
+    results["save_data"] = measure(settled(app.save_data), repeat)
+    results["refresh_display"] = measure(settled(app.refresh_display), repeat)
+    places = list(app.engine.place_names())
+    if places:
+        place = places[0]
+        results["modify_place_x100"] = measure(settled(lambda: [app.modify_place_reputation(place, 1)
+                                                            for _ in range(100)]), repeat)
+        people = list(app.engine.people(place))
+        if people:
+            person = people[0]
+            results["modify_person_x100"] = measure(settled(lambda: [app.modify_person_reputation(place, person, -1)
+                                                                 for _ in range(100)]), repeat)
+        results["bulk_places"] = measure(settled(lambda: app.engine.apply_deltas([(p, None, 1) for p in places])),
+                                         repeat)
+    close()
+    return results
+
+
+def file_size(path):
+    """Bytes on disk for a backend's data: the file itself plus its journal, if any."""
+    journal = os.path.splitext(path)[0] + ".journal"
+    return os.path.getsize(path) + (os.path.getsize(journal) if os.path.exists(journal) else 0)
+
+
+def run(sizes, repeat, backends, gui):
+    results = {}
+    files = {}
+    display, xvfb = start_virtual_display() if gui else (False, None)
+    try:
+        for size in sizes:
+            places, low, high = parse_size(size)
+            campaign = generate_campaign(places, low, high)
+            for backend in backends:
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, "reputation." + backend)
+                    write_campaign(campaign, path)
+                    files[f"{backend}/{size}"] = file_size(path)
+                    for name, stats in bench_engine(path, repeat).items():
+                        results[f"{backend}/{size}/engine/{name}"] = stats
+                    for module_name in GUI_MODULES if display else ():
+                        write_campaign(campaign, path)
+                        try:
+                            gui_results = bench_gui(module_name, path, repeat)
+                        except ImportError as e:
+                            print(f"skipping {module_name}: {e}", file=sys.stderr)
+                            continue
+                        for name, stats in gui_results.items():
+                            results[f"{backend}/{size}/{module_name}/{name}"] = stats
+                print(f"{backend} {size} done", file=sys.stderr)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    if gui and not display:
+        print("no display and no Xvfb; GUI benchmarks skipped", file=sys.stderr)
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat,
+                 "sizes": sizes, "backends": backends, "gui": display},
+        "results": results,
+        "file_bytes": files,
+    }
+
+
+def compare(old, new, threshold):
+    """Print the relative change of every result in both runs; return the names that regressed."""
+    old_files = old.get("file_bytes", {})
+    for name, size in sorted(new.get("file_bytes", {}).items()):
+        if name in old_files:
+            print(f"{name + ' file':60} {old_files[name]:12d}B -> {size:12d}B")
+    regressions = []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        before = old["results"][name]["median"]
+        after = new["results"][name]["median"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:60} {before * 1000:10.3f}ms -> {after * 1000:10.3f}ms {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reputation tracker.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks and write a JSON result file")
+    run_parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                            help="comma-separated PLACESxPEOPLE, PEOPLE a count or LOW-HIGH range")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--backends", default="json", help="comma-separated file extensions, e.g. json,db")
+    run_parser.add_argument("--no-gui", action="store_true", help="skip the GUI benchmarks")
+    run_parser.add_argument("--output", default="bench.json")
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args.sizes.split(","), args.repeat, args.backends.split(","), not args.no_gui)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        for name, size in sorted(report["file_bytes"].items()):
+            print(f"{name:40} {size:12d} bytes")
+        print(f"wrote {len(report['results'])} results to {args.output}")
+        return 0
+    with open(args.old, "r") as f:
+        old = json.load(f)
+    with open(args.new, "r") as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Compact binary snapshots of the reputation data.
+
+Layout, little-endian, every section directly after the previous one:
+
+    header         magic "RPSN", version u16, flags u16, then u32 counts of
+                   strings (S), places (P) and people (N)
+    string index   u32 * (S + 1) byte offsets into the string blob
+    place names    u32 * P string ids
+    person index   u32 * (P + 1) first person of each place; place i owns
+                   people person_index[i] up to person_index[i + 1]
+    person names   u32 * N string ids, grouped by place
+    place reps     i8 * P
+    person reps    i8 * N
+    string blob    UTF-8 names, each distinct name stored once
+
+Reputations use the engine's signed-byte columns. Snapshot maps the file and
+decodes place headers up front but a place's people only when asked, so
+opening a large campaign does not touch every person.
+"""
+import os
+import sys
+import mmap
+import struct
+import tempfile
+from array import array
+
+MAGIC = b"RPSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+
+
+def little_endian(values):
+    """Return the bytes of an array in the file's byte order."""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def u32_column(buffer, offset, count):
+    """Read count little-endian u32 values at offset without copying on little-endian machines."""
+    view = memoryview(buffer)[offset:offset + 4 * count]
+    if sys.byteorder == "little":
+        return view.cast("I")
+    values = array("I", view.tobytes())
+    values.byteswap()
+    return values
+
+
+def encode(places):
+    """Serialize a fully loaded places dict (the reputation.json layout) to snapshot bytes."""
+    string_ids = {}
+    strings = []
+
+    def intern(name):
+        string_id = string_ids.get(name)
+        if string_id is None:
+            string_id = string_ids[name] = len(strings)
+            strings.append(name.encode("utf-8"))
+        return string_id
+
+    place_names = array("I")
+    place_reps = array("b")
+    person_index = array("I", [0])
+    person_names = array("I")
+    person_reps = array("b")
+    try:
+        for place, data in places.items():
+            place_names.append(intern(place))
+            place_reps.append(data["reputation"])
+            for person, rep in data["people"].items():
+                person_names.append(intern(person))
+                person_reps.append(rep)
+            person_index.append(len(person_names))
+    except (OverflowError, TypeError) as e:
+        raise ValueError(f"Reputations must be integers from -128 to 127 for a binary snapshot: {e}")
+
+    string_index = array("I", [0])
+    for data in strings:
+        string_index.append(string_index[-1] + len(data))
+    header = HEADER.pack(MAGIC, VERSION, 0, len(strings), len(place_names), len(person_names))
+    return b"".join([header, little_endian(string_index), little_endian(place_names), little_endian(person_index),
+                     little_endian(person_names), place_reps.tobytes(), person_reps.tobytes(), b"".join(strings)])
+
+
+def write_snapshot(path, places):
+    """Write places to path through a temp file and an atomic rename; return the size in bytes."""
+    data = encode(places)
+    directory = os.path.dirname(path) or "."
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".reputation-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(data)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f"Not a reputation snapshot: {path}")
+        magic, version, _, strings, places, people = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"Not a reputation snapshot: {path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}: {path}")
+        offset = HEADER.size
+        self.string_index = u32_column(self.buffer, offset, strings + 1)
+        offset += 4 * (strings + 1)
+        self.place_names = u32_column(self.buffer, offset, places)
+        offset += 4 * places
+        self.person_index = u32_column(self.buffer, offset, places + 1)
+        offset += 4 * (places + 1)
+        self.person_names = u32_column(self.buffer, offset, people)
+        offset += 4 * people
+        self.place_reps = memoryview(self.buffer)[offset:offset + places].cast("b")
+        offset += places
+        self.person_reps = memoryview(self.buffer)[offset:offset + people].cast("b")
+        offset += people
+        self.blob = offset
+        if len(self.buffer) != offset + self.string_index[strings]:
+            raise ValueError(f"Truncated reputation snapshot: {path}")
+        # place name -> position, filled by headers()
+        self.positions = {}
+
+    def string(self, string_id):
+        start = self.blob + self.string_index[string_id]
+        end = self.blob + self.string_index[string_id + 1]
+        return str(self.buffer[start:end], "utf-8")
+
+    def headers(self):
+        """Return {place: reputation} in file order, without decoding any person."""
+        names = list(map(self.string, self.place_names))
+        self.positions = dict(zip(names, range(len(names))))
+        return dict(zip(names, self.place_reps))
+
+    def people(self, place):
+        """Return {person: reputation} of one place, or {} if the snapshot does not have it."""
+        if not self.positions and len(self.place_names):
+            self.headers()
+        i = self.positions.get(place)
+        if i is None:
+            return {}
+        start, end = self.person_index[i], self.person_index[i + 1]
+        return dict(zip(map(self.string, self.person_names[start:end]), self.person_reps[start:end]))
+
+    def to_places(self):
+        """Decode everything into the reputation.json layout."""
+        return {place: {"reputation": rep, "people": self.people(place)} for place, rep in self.headers().items()}
+
+    def close(self):
+        # Views into the map must be released before it can be closed
+        for name in ("string_index", "place_names", "person_index", "person_names", "place_reps", "person_reps"):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                column.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+def read_snapshot(path):
+    """Load a whole snapshot file as a places dict."""
+    snapshot = Snapshot(path)
+    try:
+        return snapshot.to_places()
+    finally:
+        snapshot.close()
@@ -1,3 +1,13 @@
+import os
+import sys
+import csv
+import json
+import random
+import argparse
+import itertools
+
+from prompt_templates import CACHE_ENTRIES, PromptCache, load_template
+
 race = "Human"
 heght = "1.60"
 hair_length = "long, ponytail"
@@ -10,29 +20,206 @@ piercing = "no piercing"
 clothes = "All closed bard clothes"
 tattoos = "no tatoo"
 weapon = "lute"
-body_type = "little fat" 
+body_type = "little fat"
 additional_features = "she is 56 years old, europoid"
 
-if sex == "He":
-    sex1 = "is Male"
-elif sex == "She":
-    sex1 = "is Female"
-else:
-    sex1 = "gender Define whatever you want"
-
-print(f"""You are a Dungeon Master for DnD and you have to draw a new character for your new game.
-    race: {race},
-    height: {heght}, 
-    {sex} is {sex1},
-    Hair length: {hair_length},
-    Hair color: {hair_color},
-    has {eye_color} eyes,    
-    skin color: {skin_color},    
-    {sex} is {classs},
-    clothes: {clothes}
-    piercing: {piercing},
-    tattoos: {tattoos},
-    weapon: {weapon},
-    body type: {body_type},
-    additional features: {additional_features},
-    magazine, statistics, lines pointing to clothing and gear, detailed character from a dark, high epic fantasy, lots of details, graphs --ar 9:16.""") 
\ No newline at end of file
+# Trait names used as keys in CSV/JSONL specs and trait tables; missing traits take the values above
+TRAITS = ("race", "heght", "hair_length", "hair_color", "eye_color", "skin_color", "sex", "classs",
+          "piercing", "clothes", "tattoos", "weapon", "body_type", "additional_features")
+ALIASES = {"height": "heght", "class": "classs"}
+
+# Weighted trait tables for --sample when no --tables file is given: trait -> {value: weight}
+DEFAULT_TABLES = {
+    "race": {"Human": 6, "Elf": 2, "Dwarf": 2, "Halfling": 2, "Half-Orc": 1, "Tiefling": 1, "Gnome": 1},
+    "heght": {"1.20": 1, "1.50": 2, "1.60": 3, "1.70": 3, "1.80": 2, "1.90": 1},
+    "hair_length": {"bald": 1, "short": 4, "shoulder length": 3, "long, ponytail": 2, "long, braided": 2},
+    "hair_color": {"black": 4, "brown": 4, "blond": 2, "red": 1, "grey": 2, "white": 1},
+    "eye_color": {"brown": 5, "blue": 3, "green": 2, "grey": 2, "amber": 1},
+    "skin_color": {"light": 4, "tanned": 3, "dark": 3, "pale": 1},
+    "sex": {"He": 10, "She": 10, "They": 1},
+    "classs": {"commoner": 12, "fighter": 2, "rogue": 2, "bard": 1, "cleric": 1, "wizard": 1, "ranger": 1},
+    "piercing": {"no piercing": 6, "ear rings": 2, "nose ring": 1},
+    "clothes": {"worn work clothes": 6, "merchant's finery": 2, "travelling cloak": 2, "guard uniform": 1},
+    "tattoos": {"no tatoo": 6, "tribal arm tattoo": 1, "guild mark on the neck": 1},
+    "weapon": {"none": 6, "dagger": 3, "short sword": 2, "club": 1, "crossbow": 1},
+    "body_type": {"slim": 3, "average": 5, "muscular": 2, "little fat": 2},
+    "additional_features": {"young adult": 3, "middle-aged": 4, "elderly": 2, "scarred face": 1},
+}
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "character.txt")
+
+# The {sex1} template field, looked up from sex
+GENDERS = {"He": "is Male", "She": "is Female"}
+OTHER_GENDER = "gender Define whatever you want"
+
+# Specs rendered per process-pool round trip; bounds memory no matter how many specs stream in
+POOL_CHUNK = 512
+
+
+def default_spec():
+    """Return the traits set at the top of this file."""
+    return {trait: globals()[trait] for trait in TRAITS}
+
+
+def normalize_spec(spec, defaults=None):
+    """Map aliases to trait names, trim values and fill missing traits from defaults."""
+    normalized = dict(defaults or default_spec())
+    for key, value in spec.items():
+        key = ALIASES.get(key, key)
+        if key in normalized and value is not None:
+            value = str(value).strip()
+            if value:
+                normalized[key] = value
+    return normalized
+
+
+template = None
+
+
+def use_template(path=TEMPLATE_PATH):
+    """Compile the prompt template once; also run in each pool worker."""
+    global template
+    template = load_template(path)
+
+
+def template_values(spec):
+    return dict(spec, sex1=GENDERS.get(spec["sex"], OTHER_GENDER))
+
+
+def render_prompt(spec):
+    """Render the image prompt for one character spec."""
+    if template is None:
+        use_template()
+    return template.render(template_values(spec))
+
+
+def render_cached(spec, cache):
+    """Render a spec, reusing the cached prompt when an identical spec was rendered before."""
+    if template is None:
+        use_template()
+    values = template_values(spec)
+    key = template.key(values)
+    prompt = cache.get(key)
+    if prompt is None:
+        prompt = template.render(values)
+        cache.put(key, prompt)
+    return prompt
+
+
+def read_specs(path):
+    """Yield character specs from a CSV (header row of trait names) or JSONL file, one at a time."""
+    defaults = default_spec()
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield normalize_spec(row, defaults)
+        else:
+            for line in f:
+                if line.strip():
+                    yield normalize_spec(json.loads(line), defaults)
+
+
+def load_tables(path):
+    """Read weighted trait tables: JSON trait -> {value: weight} or [[value, weight], ...]."""
+    with open(path, "r", encoding="utf-8") as f:
+        tables = json.load(f)
+    return {ALIASES.get(trait, trait): dict(values) for trait, values in tables.items()}
+
+
+def sample_specs(tables, count, seed=0):
+    """Yield count specs drawn from weighted trait tables; the same seed gives the same roster."""
+    rng = random.Random(seed)
+    defaults = default_spec()
+    columns = [(trait, list(values), list(itertools.accumulate(values.values())))
+               for trait, values in tables.items()]
+    for _ in range(count):
+        spec = dict(defaults)
+        for trait, values, cumulative in columns:
+            spec[trait] = rng.choices(values, cum_weights=cumulative)[0]
+        yield spec
+
+
+def render_all(specs, workers=0, cache=None):
+    """Yield (spec, prompt) pairs in input order, rendering cache misses in a process pool when workers > 1."""
+    if cache is None:
+        cache = PromptCache()
+    if template is None:
+        use_template()
+    if workers <= 1:
+        for spec in specs:
+            yield spec, render_cached(spec, cache)
+        return
+    from multiprocessing import Pool
+    with Pool(workers, initializer=use_template, initargs=(template.path,)) as pool:
+        while True:
+            chunk = list(itertools.islice(specs, POOL_CHUNK * workers))
+            if not chunk:
+                break
+            keys = [template.key(template_values(spec)) for spec in chunk]
+            prompts = [cache.get(key) for key in keys]
+            missing = [i for i, prompt in enumerate(prompts) if prompt is None]
+            rendered = pool.map(render_prompt, [chunk[i] for i in missing], chunksize=POOL_CHUNK)
+            for i, prompt in zip(missing, rendered):
+                prompts[i] = prompt
+                cache.put(keys[i], prompt)
+            yield from zip(chunk, prompts)
+
+
+def write_prompts(results, out, as_jsonl=True):
+    """Stream rendered prompts to a file object; return how many were written."""
+    count = 0
+    for spec, prompt in results:
+        if as_jsonl:
+            out.write(json.dumps({"spec": spec, "prompt": prompt}) + "\n")
+        else:
+            out.write(prompt + "\n\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render DnD character image prompts.")
+    parser.add_argument("--input", help="CSV or JSONL file of character specs")
+    parser.add_argument("--sample", type=int, metavar="N", help="sample N characters from weighted trait tables")
+    parser.add_argument("--tables", help="JSON trait tables for --sample (default: built-in tables)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for --sample")
+    parser.add_argument("--output", help="write to this file instead of stdout")
+    parser.add_argument("--text", action="store_true", help="write plain prompts instead of JSONL")
+    parser.add_argument("--workers", type=int, default=0, help="render in a pool of this many processes")
+    parser.add_argument("--template", default=TEMPLATE_PATH, help="prompt template file with {trait} fields")
+    parser.add_argument("--cache", help="keep rendered prompts in this file between runs")
+    parser.add_argument("--cache-size", type=int,
+                        help=f"most prompts kept in the cache (default {CACHE_ENTRIES}, or no limit with --cache)")
+    parser.add_argument("--stats", action="store_true", help="print cache hit/miss statistics")
+    args = parser.parse_args(argv)
+    use_template(args.template)
+
+    if args.input:
+        specs = read_specs(args.input)
+    elif args.sample is not None:
+        tables = load_tables(args.tables) if args.tables else DEFAULT_TABLES
+        specs = sample_specs(tables, args.sample, args.seed)
+    else:
+        # No batch options: print the character defined at the top of this file
+        print(render_prompt(default_spec()))
+        return
+
+    # A cache file smaller than the roster evicts every prompt before the next run can reuse it
+    cache_size = args.cache_size
+    if cache_size is None and not args.cache:
+        cache_size = CACHE_ENTRIES
+    cache = PromptCache(cache_size, args.cache)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = write_prompts(render_all(specs, args.workers, cache), out, not args.text)
+    finally:
+        if args.output:
+            out.close()
+    cache.save()
+    print(f"{count} prompts written", file=sys.stderr)
+    if args.stats:
+        print(json.dumps(cache.stats()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
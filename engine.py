@@ -0,0 +1,330 @@
+import sys
+from array import array
+from contextlib import contextmanager
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MIN_REPUTATION = 0
+MAX_REPUTATION = 100
+DEFAULT_REPUTATION = 50
+
+# Batches at least this large take the NumPy path when NumPy is installed
+NUMPY_BATCH_SIZE = 64
+
+
+def clamp(value):
+    """Clamp a reputation to the 0-100 range."""
+    return max(MIN_REPUTATION, min(MAX_REPUTATION, value))
+
+
+def coerce(value):
+    """Turn a stored reputation into an integer in the 0-100 range; raise ValueError if it is not a number."""
+    try:
+        return clamp(round(value))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Reputation must be a number: {value!r}")
+
+
+class Place:
+    """One place: its interned name, its slot in the place column and its people.
+
+    people maps interned person names to slots in the person column, or is None
+    while a lazy storage backend has not loaded them yet.
+    """
+
+    __slots__ = ("name", "slot", "people")
+
+    def __init__(self, name, slot, people):
+        self.name = name
+        self.slot = slot
+        self.people = people
+
+
+class ReputationEngine:
+    """GUI-independent reputation data shared by both trackers.
+
+    Reputations live in two compact signed-byte arrays, one for places and one
+    for people, indexed by the slots held in Place records. Every change is
+    reported to subscribers as a journal record (see journal.py), which is how
+    the GUIs redraw rows and persist edits. Records also carry the previous
+    value ("old") of whatever they changed, so listeners can keep running
+    aggregates without rescanning.
+
+    Changes made together - inside transaction(), and any changes listeners
+    make in response to a change - are also reported as one list to commit
+    listeners, so a bulk edit is saved, redrawn and undone as one unit.
+
+    replaying is True while recorded changes are applied again (undo/redo, or
+    edits merged in from another copy of the file); listeners that derive
+    further changes, like propagation ripples, skip them then because the
+    replayed records already contain their effects.
+    """
+
+    def __init__(self, people_loader=None):
+        self.people_loader = people_loader
+        self.places = {}
+        self.place_reps = array("b")
+        self.person_reps = array("b")
+        self.free_place_slots = []
+        self.free_person_slots = []
+        self.listeners = []
+        self.commit_listeners = []
+        self.depth = 0
+        self.uncommitted = []
+        self.replaying = False
+
+    def load(self, places):
+        """Replace all data with a places dict in the reputation.json layout.
+
+        A missing people entry means no people; reputations are rounded and
+        clamped to the 0-100 range. Raises ValueError, leaving the engine
+        empty, if a reputation is not a number.
+        """
+        self.places = {}
+        self.place_reps = array("b")
+        self.person_reps = array("b")
+        self.free_place_slots = []
+        self.free_person_slots = []
+        try:
+            for name, data in places.items():
+                place = self.new_place(name, coerce(data.get("reputation", DEFAULT_REPUTATION)))
+                people = data.get("people", {})
+                if people is not None:
+                    place.people = {}
+                    for person, rep in people.items():
+                        place.people[sys.intern(person)] = self.new_person_slot(coerce(rep))
+        except ValueError as e:
+            self.load({})
+            raise ValueError(f"{e} (place {name!r})")
+
+    def to_dict(self):
+        """Return the data in the reputation.json layout; unloaded people stay None."""
+        places = {}
+        for name, place in self.places.items():
+            people = None
+            if place.people is not None:
+                people = {person: self.person_reps[slot] for person, slot in place.people.items()}
+            places[name] = {"reputation": self.place_reps[place.slot], "people": people}
+        return places
+
+    def new_place(self, name, reputation=DEFAULT_REPUTATION):
+        name = sys.intern(name)
+        if self.free_place_slots:
+            slot = self.free_place_slots.pop()
+            self.place_reps[slot] = reputation
+        else:
+            slot = len(self.place_reps)
+            self.place_reps.append(reputation)
+        place = Place(name, slot, None)
+        self.places[name] = place
+        return place
+
+    def new_person_slot(self, reputation=DEFAULT_REPUTATION):
+        if self.free_person_slots:
+            slot = self.free_person_slots.pop()
+            self.person_reps[slot] = reputation
+        else:
+            slot = len(self.person_reps)
+            self.person_reps.append(reputation)
+        return slot
+
+    def place_names(self):
+        return self.places.keys()
+
+    def has_place(self, place):
+        return place in self.places
+
+    def is_loaded(self, place):
+        return self.places[place].people is not None
+
+    def load_people(self, place):
+        """Return a place's person -> slot dict, fetching it from storage on first use."""
+        record = self.places[place]
+        if record.people is None:
+            loaded = self.people_loader(place) if self.people_loader else {}
+            record.people = {sys.intern(person): self.new_person_slot(rep) for person, rep in loaded.items()}
+        return record.people
+
+    def people(self, place):
+        """Return the names of a place's people in insertion order."""
+        return self.load_people(place).keys()
+
+    def has_person(self, place, person):
+        return person in self.load_people(place)
+
+    def place_reputation(self, place):
+        return self.place_reps[self.places[place].slot]
+
+    def person_reputation(self, place, person):
+        return self.person_reps[self.places[place].people[person]]
+
+    def __len__(self):
+        return len(self.places)
+
+    def subscribe(self, listener):
+        """Call listener(record) after every change."""
+        self.listeners.append(listener)
+
+    def subscribe_commits(self, listener):
+        """Call listener(records) once per change or transaction, with every record it produced."""
+        self.commit_listeners.append(listener)
+
+    def emit(self, record):
+        self.uncommitted.append(record)
+        with self.transaction():
+            for listener in self.listeners:
+                listener(record)
+
+    @contextmanager
+    def transaction(self):
+        """Group the changes made inside into one commit; nested transactions join the outer one."""
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if not self.depth and self.uncommitted:
+                records, self.uncommitted = self.uncommitted, []
+                for listener in self.commit_listeners:
+                    listener(records)
+
+    def add_place(self, place):
+        if place in self.places:
+            raise ValueError(f"Place already exists: {place}")
+        self.new_place(place).people = {}
+        self.emit({"op": "add_place", "place": place})
+
+    def add_person(self, place, person, value=DEFAULT_REPUTATION):
+        self.check_value(value)
+        people = self.load_people(place)
+        if person in people:
+            raise ValueError(f"Person already exists: {person}")
+        people[sys.intern(person)] = self.new_person_slot(value)
+        self.emit({"op": "add_person", "place": place, "person": person, "value": value})
+
+    def delete_place(self, place):
+        # The record keeps the removed values so the deletion can be undone
+        people = {person: self.person_reps[slot] for person, slot in self.load_people(place).items()}
+        record = self.places.pop(place)
+        self.free_place_slots.append(record.slot)
+        self.free_person_slots.extend(record.people.values())
+        self.emit({"op": "delete_place", "place": place, "old": self.place_reps[record.slot], "people": people})
+
+    def delete_person(self, place, person):
+        slot = self.places[place].people.pop(person)
+        self.free_person_slots.append(slot)
+        self.emit({"op": "delete_person", "place": place, "person": person, "old": self.person_reps[slot]})
+
+    def set_place_reputation(self, place, value):
+        self.check_value(value)
+        slot = self.places[place].slot
+        old = self.place_reps[slot]
+        self.place_reps[slot] = value
+        self.emit({"op": "set_place", "place": place, "value": value, "old": old})
+
+    def set_person_reputation(self, place, person, value):
+        self.check_value(value)
+        slot = self.places[place].people[person]
+        old = self.person_reps[slot]
+        self.person_reps[slot] = value
+        self.emit({"op": "set_person", "place": place, "person": person, "value": value, "old": old})
+
+    def modify_place_reputation(self, place, delta):
+        slot = self.places[place].slot
+        old = self.place_reps[slot]
+        value = clamp(old + delta)
+        self.place_reps[slot] = value
+        self.emit({"op": "delta_place", "place": place, "delta": delta, "value": value, "old": old})
+        return value
+
+    def modify_person_reputation(self, place, person, delta):
+        slot = self.places[place].people[person]
+        old = self.person_reps[slot]
+        value = clamp(old + delta)
+        self.person_reps[slot] = value
+        self.emit({"op": "delta_person", "place": place, "person": person, "delta": delta, "value": value, "old": old})
+        return value
+
+    def check_value(self, value):
+        if not MIN_REPUTATION <= value <= MAX_REPUTATION:
+            raise ValueError(f"Reputation must be between {MIN_REPUTATION} and {MAX_REPUTATION}.")
+
+    def apply_deltas(self, deltas):
+        """Apply many (place, person, delta) changes in one clamped pass.
+
+        person is None for a place's own reputation. Deltas aimed at the same
+        entity are summed before clamping, so the result does not depend on the
+        order of the batch. One delta record is emitted per entity whose value
+        changed, all in one transaction.
+        """
+        place_totals = {}
+        person_totals = {}
+        for place, person, delta in deltas:
+            if person is None:
+                slot = self.places[place].slot
+                place_totals[slot] = place_totals.get(slot, 0) + delta
+            else:
+                slot = self.places[place].people[person]
+                person_totals[slot] = person_totals.get(slot, 0) + delta
+        place_values = self.apply_column(self.place_reps, place_totals)
+        person_values = self.apply_column(self.person_reps, person_totals)
+
+        with self.transaction():
+            for place, person, _ in deltas:
+                if person is None:
+                    slot = self.places[place].slot
+                    old, value = place_values.pop(slot, (None, None))
+                    if old != value:
+                        self.emit({"op": "delta_place", "place": place, "delta": place_totals[slot],
+                                   "value": value, "old": old})
+                else:
+                    slot = self.places[place].people[person]
+                    old, value = person_values.pop(slot, (None, None))
+                    if old != value:
+                        self.emit({"op": "delta_person", "place": place, "person": person,
+                                   "delta": person_totals[slot], "value": value, "old": old})
+
+    def reputation(self, place, person=None):
+        if person is None:
+            return self.place_reputation(place)
+        return self.person_reputation(place, person)
+
+    def add_many(self, entities, delta):
+        """Add delta to every (place, person) in entities - person None for a place - in one batch."""
+        self.apply_deltas([(place, person, delta) for place, person in entities])
+
+    def set_many(self, entities, value):
+        """Set every (place, person) in entities to value in one batch."""
+        self.check_value(value)
+        self.apply_deltas([(place, person, value - self.reputation(place, person)) for place, person in entities])
+
+    def scale_toward(self, entities, target, fraction):
+        """Move every (place, person) in entities the given fraction of the way to target, in one batch."""
+        self.check_value(target)
+        self.apply_deltas([(place, person, round((target - self.reputation(place, person)) * fraction))
+                           for place, person in entities])
+
+    def apply_column(self, column, totals):
+        """Add summed deltas to column slots with clamping; return {slot: (old, new)}."""
+        if not totals:
+            return {}
+        slots = list(totals)
+        if numpy is not None and len(slots) >= NUMPY_BATCH_SIZE:
+            view = numpy.frombuffer(column, dtype=numpy.int8)
+            index = numpy.fromiter(slots, dtype=numpy.intp, count=len(slots))
+            old = view[index].astype(numpy.int64)
+            summed = old + numpy.fromiter(totals.values(), dtype=numpy.int64, count=len(slots))
+            values = numpy.clip(summed, MIN_REPUTATION, MAX_REPUTATION)
+            view[index] = values
+            # Release the buffer so the array can grow again
+            del view
+            return dict(zip(slots, zip(old.tolist(), values.tolist())))
+        values = {}
+        for slot, delta in totals.items():
+            old = column[slot]
+            column[slot] = clamp(old + delta)
+            values[slot] = (old, column[slot])
+        return values
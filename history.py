@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import bisect
+from array import array
+
+from engine import DEFAULT_REPUTATION
+
+# Value stored when a place or person is deleted
+DELETED = -1
+
+# Largest session number the unsigned 32-bit session column holds
+MAX_SESSION = 0xFFFFFFFF
+
+
+class History:
+    """Append-only timeline of reputation values in compact columns.
+
+    Every change is one row across four arrays: timestamp, session number,
+    entity id and the value after the change. Entities - (place, None) for a
+    place, (place, person) for a person - are interned to ids, and each entity
+    keeps the indices of its own rows. An entity's rows are in time and
+    session order, so as-of and range queries are binary searches over its
+    rows instead of scans.
+
+    When given a directory, new rows are appended to one file per column on
+    flush(), so saving costs only what changed since the last flush.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.times = array("d")
+        self.sessions = array("I")
+        self.entities = array("I")
+        self.values = array("b")
+        self.keys = []
+        self.ids = {}
+        self.rows = []
+        # place -> ids of its people, so deleting a place can close them out
+        self.place_people = {}
+        self.session = 1
+        self.flushed_rows = 0
+        self.flushed_keys = 0
+        if directory is not None:
+            self.load()
+
+    def __len__(self):
+        return len(self.values)
+
+    def entity_id(self, place, person):
+        key = (place, person)
+        entity = self.ids.get(key)
+        if entity is None:
+            entity = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.rows.append(array("I"))
+            if person is not None:
+                self.place_people.setdefault(place, set()).add(entity)
+        return entity
+
+    def start_session(self, session):
+        """Tag the changes that follow with a session number; sessions only move forward."""
+        if not 0 <= session <= MAX_SESSION:
+            raise ValueError(f"Session must be between 0 and {MAX_SESSION}.")
+        if session < self.session:
+            raise ValueError(f"Session {session} is before the current session {self.session}.")
+        self.session = session
+
+    def append(self, place, person, value, ts=None):
+        """Record an entity's value after a change."""
+        entity = self.entity_id(place, person)
+        ts = time.time() if ts is None else ts
+        if self.times and ts < self.times[-1]:
+            # Keep the time column sorted even if the clock steps back
+            ts = self.times[-1]
+        self.add_row(entity, ts, self.session, value)
+
+    def add_row(self, entity, ts, session, value):
+        # A value a column rejects must leave the columns in step and no index past their end
+        row = len(self.values)
+        try:
+            self.times.append(ts)
+            self.sessions.append(session)
+            self.entities.append(entity)
+            self.values.append(value)
+        except (OverflowError, TypeError):
+            for _, column in self.columns():
+                del column[row:]
+            raise
+        self.rows[entity].append(row)
+
+    def record_baseline(self, places):
+        """Record the current value of every place and loaded person, e.g. for a new history.
+
+        People of lazily loaded places get theirs from record_people_baseline() when first loaded.
+        """
+        now = time.time()
+        for place, data in places.items():
+            self.append(place, None, data["reputation"], now)
+            for person, rep in (data["people"] or {}).items():
+                self.append(place, person, rep, now)
+
+    def record_people_baseline(self, place, people):
+        """Record the values of a lazily loaded place's people that the timeline has never seen.
+
+        Every change is recorded, so a person without rows still has the value
+        they had when the timeline began; the row is dated to its first row.
+        """
+        ts = self.times[0] if self.times else time.time()
+        session = self.sessions[0] if self.sessions else self.session
+        for person, rep in people.items():
+            if (place, person) not in self.ids:
+                self.add_row(self.entity_id(place, person), ts, session, rep)
+
+    def on_change(self, record):
+        """Engine listener: turn a change record into history rows."""
+        op = record["op"]
+        place = record["place"]
+        ts = record.get("ts")
+        if op == "add_place":
+            self.append(place, None, DEFAULT_REPUTATION, ts)
+        elif op == "delete_place":
+            self.append(place, None, DELETED, ts)
+            for entity in self.place_people.get(place, ()):
+                if self.values[self.rows[entity][-1]] != DELETED:
+                    self.append(place, self.keys[entity][1], DELETED, ts)
+        elif op == "delete_person":
+            self.append(place, record["person"], DELETED, ts)
+        else:
+            self.append(place, record.get("person"), record["value"], ts)
+
+    def row_before(self, entity, column, bound):
+        """Index of the entity's last row whose column value is <= bound, or None."""
+        rows = self.rows[entity]
+        i = bisect.bisect_right(rows, bound, key=column.__getitem__)
+        return rows[i - 1] if i else None
+
+    def value_at(self, place, person=None, ts=None, session=None):
+        """Return an entity's value as of a time or the end of a session, or None if unknown or deleted."""
+        entity = self.ids.get((place, person))
+        if entity is None:
+            return None
+        if session is not None:
+            row = self.row_before(entity, self.sessions, session)
+        else:
+            row = self.row_before(entity, self.times, time.time() if ts is None else ts)
+        if row is None or self.values[row] == DELETED:
+            return None
+        return self.values[row]
+
+    def series(self, place, person=None, start=None, end=None):
+        """Return (timestamp, session, value) for an entity's changes with start <= timestamp <= end."""
+        entity = self.ids.get((place, person))
+        if entity is None:
+            return []
+        rows = self.rows[entity]
+        first = 0 if start is None else bisect.bisect_left(rows, start, key=self.times.__getitem__)
+        last = len(rows) if end is None else bisect.bisect_right(rows, end, key=self.times.__getitem__)
+        return [(self.times[row], self.sessions[row], self.values[row]) for row in rows[first:last]]
+
+    def snapshot_at(self, ts=None, session=None):
+        """Return the places dict (reputation.json layout) as of a time or the end of a session."""
+        places = {}
+        people = []
+        for (place, person) in self.keys:
+            value = self.value_at(place, person, ts, session)
+            if value is None:
+                continue
+            if person is None:
+                places[place] = {"reputation": value, "people": {}}
+            else:
+                people.append((place, person, value))
+        for place, person, value in people:
+            if place in places:
+                places[place]["people"][person] = value
+        return places
+
+    def column_path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load(self):
+        """Read the column files, dropping rows a crash left in only some columns."""
+        if not os.path.isdir(self.directory):
+            return
+        meta_path = self.column_path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self.session = json.load(f)["session"]
+        keys_path = self.column_path("entities.jsonl")
+        if os.path.exists(keys_path):
+            with open(keys_path, "r") as f:
+                for line in f:
+                    try:
+                        place, person = json.loads(line)
+                    except ValueError:
+                        break
+                    self.entity_id(place, person)
+        sizes = []
+        for name, column in self.columns():
+            path = self.column_path(name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                sizes.append(len(data))
+                column.frombytes(data[:len(data) - len(data) % column.itemsize])
+            else:
+                sizes.append(0)
+        count = min(len(self.times), len(self.sessions), len(self.entities), len(self.values))
+        for row in range(count):
+            entity = self.entities[row]
+            if entity >= len(self.keys):
+                count = row
+                break
+            self.rows[entity].append(row)
+        for column in (self.times, self.sessions, self.entities, self.values):
+            del column[count:]
+        self.flushed_rows = count
+        self.flushed_keys = len(self.keys)
+        if any(size != count * column.itemsize for size, (_, column) in zip(sizes, self.columns())):
+            # A torn append left the columns out of step; rewrite them once
+            for name, column in self.columns():
+                with open(self.column_path(name), "wb") as f:
+                    column.tofile(f)
+
+    def columns(self):
+        return (("time.f64", self.times), ("session.u32", self.sessions),
+                ("entity.u32", self.entities), ("value.i8", self.values))
+
+    def flush(self):
+        """Append rows and entity names added since the last flush to the column files."""
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self.flushed_keys < len(self.keys):
+            with open(self.column_path("entities.jsonl"), "a") as f:
+                for key in self.keys[self.flushed_keys:]:
+                    f.write(json.dumps(key) + "\n")
+            self.flushed_keys = len(self.keys)
+        if self.flushed_rows < len(self.values):
+            start = self.flushed_rows
+            for name, column in self.columns():
+                with open(self.column_path(name), "ab") as f:
+                    column[start:].tofile(f)
+            self.flushed_rows = len(self.values)
+        with open(self.column_path("meta.json"), "w") as f:
+            json.dump({"session": self.session}, f)
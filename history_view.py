@@ -0,0 +1,68 @@
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+
+class HistoryWindow:
+    """Window showing the campaign as of a past session and one entity's time series."""
+
+    def __init__(self, root, history):
+        self.history = history
+        self.window = tk.Toplevel(root)
+        self.window.title("Reputation History")
+        self.window.geometry("520x560")
+
+        controls = ttk.Frame(self.window, padding=5)
+        controls.pack(fill=tk.X)
+        ttk.Label(controls, text="As of session:").pack(side=tk.LEFT)
+        self.session_entry = ttk.Entry(controls, width=6, justify="center")
+        self.session_entry.insert(0, str(history.session))
+        self.session_entry.pack(side=tk.LEFT, padx=5)
+        self.session_entry.bind("<Return>", lambda e: self.show_snapshot())
+        ttk.Button(controls, text="Show", command=self.show_snapshot).pack(side=tk.LEFT)
+
+        self.snapshot_tree = ttk.Treeview(self.window, columns=("place", "person", "reputation"),
+                                          show="headings", height=14)
+        for column, width in (("place", 200), ("person", 200), ("reputation", 80)):
+            self.snapshot_tree.heading(column, text=column.title())
+            self.snapshot_tree.column(column, width=width)
+        self.snapshot_tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.snapshot_tree.bind("<<TreeviewSelect>>", lambda e: self.show_series())
+
+        ttk.Label(self.window, text="Changes of the selected row:", padding=5).pack(anchor="w")
+        self.series_tree = ttk.Treeview(self.window, columns=("time", "session", "reputation"),
+                                        show="headings", height=8)
+        for column, width in (("time", 240), ("session", 80), ("reputation", 80)):
+            self.series_tree.heading(column, text=column.title())
+            self.series_tree.column(column, width=width)
+        self.series_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+
+        self.entities = {}
+        self.show_snapshot()
+
+    def show_snapshot(self):
+        """Fill the upper table with every place and person as of the chosen session."""
+        try:
+            session = int(self.session_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid session number.", parent=self.window)
+            return
+        self.snapshot_tree.delete(*self.snapshot_tree.get_children())
+        self.entities = {}
+        for place, data in self.history.snapshot_at(session=session).items():
+            iid = self.snapshot_tree.insert("", tk.END, values=(place, "", data["reputation"]))
+            self.entities[iid] = (place, None)
+            for person, rep in data["people"].items():
+                iid = self.snapshot_tree.insert("", tk.END, values=(place, person, rep))
+                self.entities[iid] = (place, person)
+
+    def show_series(self):
+        """Fill the lower table with the changes of the selected place or person."""
+        self.series_tree.delete(*self.series_tree.get_children())
+        selection = self.snapshot_tree.selection()
+        if not selection:
+            return
+        place, person = self.entities[selection[0]]
+        for ts, session, value in self.history.series(place, person):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+            self.series_tree.insert("", tk.END, values=(stamp, session, "deleted" if value < 0 else value))
@@ -0,0 +1,178 @@
+import os
+import time
+import bisect
+import functools
+
+from persistence import atomic_write_json
+
+# Upper bounds in milliseconds of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# One frame at 60 Hz; calls slower than this are counted as over budget
+FRAME_BUDGET_MS = 16.7
+
+
+class Histogram:
+    """Call count and latency distribution of one instrumented operation."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.over_budget = 0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.calls += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if ms > FRAME_BUDGET_MS:
+            self.over_budget += 1
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the given fraction of calls."""
+        if not self.calls:
+            return 0.0
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        buckets = {f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets[f">{LATENCY_BUCKETS_MS[-1]}"] = self.counts[-1]
+        return {"calls": self.calls, "total_ms": self.total_ms, "max_ms": self.max_ms,
+                "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+                "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95),
+                "over_budget": self.over_budget, "buckets_ms": buckets}
+
+
+class Tally:
+    """Per-call amounts of something an operation produced, e.g. widgets created or bytes written."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.calls = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def add(self, amount):
+        self.calls += 1
+        self.total += amount
+        self.last = amount
+        if amount > self.max:
+            self.max = amount
+
+    def mean(self):
+        return self.total / self.calls if self.calls else 0.0
+
+    def to_dict(self):
+        return {"calls": self.calls, "total": self.total, "max": self.max, "last": self.last, "mean": self.mean()}
+
+
+class Instruments:
+    """Opt-in timers around a GUI's hot paths.
+
+    watch() registers methods to time; nothing is wrapped until enable(), so
+    disabled instruments add no cost to the calls. Enabling replaces each
+    watched attribute on its instance with a timing wrapper, and disable()
+    puts the original back. Probes are counters read before and after each
+    call (e.g. widgets created so far); their differences are tallied per
+    operation.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.since = None
+        self.watched = []
+        self.originals = []
+        self.timers = {}
+        self.tallies = {}
+
+    def watch(self, obj, names, prefix="", probes=None):
+        """Time obj.<name> for each name, reporting it as prefix + name.
+
+        probes maps a tally name to a function returning a running count.
+        """
+        for name in names:
+            self.watched.append((obj, name, prefix + name, probes or {}))
+        if self.enabled:
+            for entry in self.watched[-len(names):]:
+                self.install(*entry)
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        if self.since is None:
+            self.since = time.time()
+        for entry in self.watched:
+            self.install(*entry)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for obj, name, had_attribute, original in reversed(self.originals):
+            if had_attribute:
+                setattr(obj, name, original)
+            else:
+                delattr(obj, name)
+        self.originals = []
+
+    def install(self, obj, name, label, probes):
+        original = getattr(obj, name)
+        self.originals.append((obj, name, name in vars(obj), original))
+        timer = self.timers.setdefault(label, Histogram())
+        tallies = [(self.tallies.setdefault(f"{label}.{probe}", Tally()), read) for probe, read in probes.items()]
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            before = [read() for _, read in tallies]
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                timer.add((time.perf_counter() - start) * 1000)
+                for (tally, read), value in zip(tallies, before):
+                    tally.add(read() - value)
+
+        setattr(obj, name, timed)
+
+    def reset(self):
+        """Forget everything recorded so far; the wrappers stay installed."""
+        for timer in self.timers.values():
+            timer.clear()
+        for tally in self.tallies.values():
+            tally.clear()
+        self.since = time.time() if self.enabled else None
+
+    def snapshot(self):
+        return {"since": self.since, "time": time.time(), "frame_budget_ms": FRAME_BUDGET_MS,
+                "timers": {name: timer.to_dict() for name, timer in self.timers.items()},
+                "tallies": {name: tally.to_dict() for name, tally in self.tallies.items()}}
+
+    def slowest(self):
+        """Return the timer names ordered by total time spent, slowest first."""
+        return sorted(self.timers, key=lambda name: self.timers[name].total_ms, reverse=True)
+
+    def dump(self, path):
+        """Write the snapshot as JSON and return the path."""
+        atomic_write_json(path, self.snapshot())
+        return path
+
+
+def enabled_by_env(name="REPUTATION_INSTRUMENT"):
+    """True when the environment variable asks for instrumentation from startup."""
+    return os.environ.get(name, "") not in ("", "0")
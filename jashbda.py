@@ -1,19 +1,66 @@
 import os
-import json
+import itertools
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import simpledialog, messagebox
+from virtual_list import VirtualList
+from persistence import WriteBehindSaver
+from storage import open_storage
+from engine import ReputationEngine, DEFAULT_REPUTATION
+from propagation import load_propagator
+from history import History
+from history_view import HistoryWindow
+from search import Search
+from undo import UndoStack
+from startup import BackgroundTask, StartupTimer
+from instrumentation import Instruments, enabled_by_env
+from perf_view import PerfOverlay
+from sync import (ExternalWatcher, EnginePlaces, plan_merge, apply_changes, restate_records, superseded,
+                  can_keep_ours, list_conflicts)
+from server import SessionServer, load_server_config
 
 FILE_PATH = r"C:\Users\saqom\OneDrive\Deskto\Folders\vscode folder\reputation\reputation.json"
+SAVE_QUIET_MS = 500
+SAVE_MAX_DELAY_MS = 3000
+RELATIONS_PATH = os.path.splitext(FILE_PATH)[0] + ".relations.json"
+HISTORY_DIR = os.path.splitext(FILE_PATH)[0] + ".history"
+SEARCH_DELAY_MS = 150
+EXTERNAL_POLL_MS = 2000
+PERF_PATH = os.path.splitext(FILE_PATH)[0] + ".perf.json"
+SERVER_PATH = os.path.splitext(FILE_PATH)[0] + ".server.json"
+RENDER_CHUNK = 2000
+ROW_HEIGHTS = {"place": 64, "person": 40, "empty": 40, "no_matches": 40, "loading": 40}
 
 class ReputationTrackerGUI:
     def __init__(self, root):
+        self.startup = StartupTimer()
         self.root = root
         self.root.title("D&D Reputation Tracker")
         self.root.geometry("600x600")
         self.style = ttk.Style()
         self.place_visibility = {}
-        self.places = self.load_data()
+        self.storage = open_storage(FILE_PATH)
+        self.pending_records = []
+        # Outside changes to the (shared, synced) data file are merged in, never overwritten
+        self.watcher = ExternalWatcher(self.storage)
+        self.merging = False
+        # Set while outside changes are merged, conflict dialog included; nothing is written meanwhile
+        self.checking = False
+        # All data logic lives in the shared engine; this class is only the view
+        self.engine = ReputationEngine(self.load_people)
+        # Propagation and the name index see each record; rows redraw once per commit
+        self.propagator = self.load_propagator()
+        self.search = Search(self.engine, self.storage.find_people)
+        self.search_job = None
+        self.search_results = None
+        self.selection = set()
+        self.engine.subscribe_commits(self.on_changes)
+        # One undo step per commit, kept as inverse records rather than copies of the data
+        self.undo_stack = UndoStack(self.engine)
+        # Read in the background after the shell is shown
+        self.history = None
+        self.saver = WriteBehindSaver(self.root, self.flush_changes, SAVE_QUIET_MS, SAVE_MAX_DELAY_MS)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.main_frame = ttk.Frame(self.root, padding=10)
         self.main_frame.pack(fill=BOTH, expand=True)
@@ -21,158 +68,529 @@ class ReputationTrackerGUI:
         header_label = ttk.Label(self.main_frame, text="D&D Reputation Tracker", bootstyle="primary", font=("Helvetica", 16, "bold"))
         header_label.pack(pady=10)
         
+        # Toolbars are packed once the data is in
         top_frame = ttk.Frame(self.main_frame)
-        top_frame.pack(fill=X, pady=5)
+        self.toolbars = [(top_frame, {"fill": X, "pady": 5})]
         
         add_place_btn = ttk.Button(top_frame, text="Add Place", bootstyle="success", command=self.add_place)
         add_place_btn.pack(side=LEFT, padx=5)
         
+        ttk.Button(top_frame, text="Undo", bootstyle="secondary", command=self.undo).pack(side=LEFT)
+        ttk.Button(top_frame, text="Redo", bootstyle="secondary", command=self.redo).pack(side=LEFT, padx=5)
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
+        self.root.bind("<Control-Z>", lambda e: self.redo())
+        
+        # Live filter, e.g. "guard", "hostile" or "smith >= 60"
+        self.search_var = ttk.StringVar()
+        ttk.Entry(top_frame, width=18, textvariable=self.search_var).pack(side=LEFT, padx=5)
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        
+        # Session tag for the change history
+        ttk.Button(top_frame, text="History", bootstyle="info", command=self.show_history).pack(side=RIGHT, padx=5)
+        # Live view for players' machines (server.py), configured by SERVER_PATH
+        self.share_btn = ttk.Button(top_frame, text="Share", bootstyle="info-outline", command=self.toggle_server)
+        self.share_btn.pack(side=RIGHT)
+        self.server = None
+        self.session_var = ttk.StringVar()
+        session_box = ttk.Spinbox(top_frame, from_=1, to=9999, width=5, textvariable=self.session_var, command=self.change_session)
+        session_box.bind("<Return>", lambda e: self.change_session())
+        session_box.pack(side=RIGHT)
+        ttk.Label(top_frame, text="Session:").pack(side=RIGHT, padx=5)
+        
+        # Bulk edits on the checked rows, one engine transaction each
+        bulk_frame = ttk.Frame(self.main_frame)
+        self.toolbars.append((bulk_frame, {"fill": X, "pady": (0, 5)}))
+        ttk.Button(bulk_frame, text="Select Shown", bootstyle="secondary", command=self.select_shown).pack(side=LEFT, padx=5)
+        ttk.Button(bulk_frame, text="Clear", bootstyle="secondary", command=self.clear_selection).pack(side=LEFT)
+        self.selection_label = ttk.Label(bulk_frame, text="0 selected")
+        self.selection_label.pack(side=LEFT, padx=5)
+        ttk.Button(bulk_frame, text="Reset 50", bootstyle="warning", command=self.bulk_reset).pack(side=RIGHT, padx=5)
+        ttk.Button(bulk_frame, text="Toward", bootstyle="info", command=self.bulk_toward).pack(side=RIGHT)
+        ttk.Button(bulk_frame, text="Set", bootstyle="info", command=self.bulk_set).pack(side=RIGHT, padx=5)
+        ttk.Button(bulk_frame, text="Add", bootstyle="info", command=self.bulk_add).pack(side=RIGHT)
+        self.bulk_entry = ttk.Entry(bulk_frame, width=5, justify="center")
+        self.bulk_entry.insert(0, "5")
+        self.bulk_entry.pack(side=RIGHT, padx=5)
+        
         self.canvas = ttk.Canvas(self.main_frame)
         self.canvas.pack(side=LEFT, fill=BOTH, expand=True)
         scrollbar = ttk.Scrollbar(self.main_frame, orient="vertical", command=self.canvas.yview)
         scrollbar.pack(side=RIGHT, fill=Y)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
         
-        self.display_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.display_frame, anchor="nw")
-        self.display_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        # Only rows in view get widgets; they are reused while scrolling
+        self.view = VirtualList(self.canvas, scrollbar, ROW_HEIGHTS, self.make_row, self.bind_row)
+        self.fill_job = None
+        
+        # Opt-in hot-path timers (or REPUTATION_INSTRUMENT=1), shown with F12
+        self.instruments = Instruments()
+        self.instrument()
+        self.perf_overlay = PerfOverlay(self.canvas, self.instruments, PERF_PATH)
+        self.root.bind("<F12>", lambda e: self.perf_overlay.toggle())
+        if enabled_by_env():
+            self.instruments.enable()
         
-        self.refresh_display()
+        # Staged startup: paint the shell, read on a worker thread, then fill the rows in chunks
+        self.view.set_rows([("loading", None)])
+        self.root.update_idletasks()
+        self.startup.mark("first paint")
+        BackgroundTask(self.root, self.read_data, self.data_loaded, self.data_failed)
+    
+    def read_data(self):
+        # Worker thread: storage and history files only, no widgets
+        return self.read_places(), History(HISTORY_DIR)
+    
+    def read_places(self):
+        try:
+            return self.watcher.load(), None
+        except Exception as e:
+            return {}, e
+    
+    def data_loaded(self, result):
+        (places, error), history = result
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to load data: {error}")
+        self.history = history
+        self.engine.subscribe(self.history.on_change)
+        self.session_var.set(str(self.history.session))
+        self.load_data(places)
+        for frame, options in self.toolbars:
+            frame.pack(before=self.canvas, **options)
+        self.fill_rows(self.iter_display_rows(), first=True)
+        self.root.after(EXTERNAL_POLL_MS, self.poll_external)
+    
+    def data_failed(self, error):
+        messagebox.showerror("Error", f"Failed to load data: {error}")
+        self.data_loaded((({}, None), History()))
+    
+    def fill_rows(self, rows, first=False):
+        chunk = list(itertools.islice(rows, RENDER_CHUNK))
+        if first:
+            self.view.set_rows(chunk)
+            self.startup.mark("interactive")
+        else:
+            self.view.append_rows(chunk)
+        if len(chunk) == RENDER_CHUNK:
+            self.fill_job = self.root.after(1, self.fill_rows, rows)
+        else:
+            self.fill_job = None
+            self.startup.mark("all rows")
+            self.startup.report()
     
-    def load_data(self):
-        if os.path.exists(FILE_PATH):
-            try:
-                with open(FILE_PATH, "r") as f:
-                    return json.load(f)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load data: {e}")
-        return {}
+    def load_data(self, places=None):
+        if places is None:
+            places, error = self.read_places()
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to load data: {error}")
+        if self.storage.lazy:
+            # People are fetched when a place is first shown
+            for place in places:
+                self.place_visibility[place] = False
+        try:
+            self.engine.load(places)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Failed to load data: {e}")
+        if self.propagator is not None:
+            self.propagator.reset()
+        self.search.rebuild()
+        self.undo_stack.clear()
+        if not len(self.history):
+            self.history.record_baseline(self.engine.to_dict())
+    
+    def load_people(self, place):
+        # Lazy storages hand out people on first expand; the history has no rows for them yet
+        people = self.storage.load_people(place)
+        self.watcher.loaded_people(place, people)
+        if self.history is not None:
+            self.history.record_people_baseline(place, people)
+        return people
+    
+    def instrument(self):
+        view = self.view
+        widgets = {"widgets_created": lambda: view.created, "widgets_destroyed": lambda: view.destroyed}
+        written = {"bytes_written": lambda: self.storage.bytes_written}
+        self.instruments.watch(self, ["refresh_display", "update_rows", "show_changes", "apply_search"], probes=widgets)
+        self.instruments.watch(view, ["render"], "view.", widgets)
+        self.instruments.watch(self, ["save_data"], probes=written)
+        self.instruments.watch(self.saver, ["flush"], "saver.", written)
+        self.instruments.watch(self, ["load_data", "modify_place_reputation", "modify_person_reputation",
+                                      "set_place_reputation", "set_person_reputation"])
+    
+    def load_propagator(self):
+        try:
+            return load_propagator(self.engine, RELATIONS_PATH)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load relations: {e}")
+            return None
     
     def save_data(self):
+        # Full snapshot; for the JSON backend this folds the journal into reputation.json
+        if self.checking:
+            self.root.after(EXTERNAL_POLL_MS, self.save_data)
+            return
         try:
-            directory = os.path.dirname(FILE_PATH)
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            with open(FILE_PATH, "w") as f:
-                json.dump(self.places, f, indent=4)
+            self.flush_changes()
+            self.merge_before_write()
+            self.storage.snapshot(self.engine.to_dict())
+            self.watcher.wrote([])
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save data: {e}")
     
+    def on_changes(self, records):
+        # Merged records are already in the file
+        if not self.merging:
+            self.log_changes(records)
+        self.show_changes(records)
+    
+    def log_changes(self, records):
+        self.pending_records.extend(records)
+        self.saver.request()
+    
+    def flush_changes(self):
+        # Never write over edits another machine saved since we last looked
+        if self.checking:
+            # Fired from the conflict dialog's event loop; write once the user picked a side
+            self.saver.request()
+            return
+        self.merge_before_write()
+        records, self.pending_records = self.pending_records, []
+        try:
+            self.storage.write(records, self.engine.to_dict)
+            self.watcher.wrote(records)
+            self.history.flush()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save data: {e}")
+    
+    def merge_before_write(self):
+        # Check again if another save landed while a conflict dialog was open; a later one stays flagged for the next poll
+        self.check_external()
+        if self.watcher.before_write():
+            self.check_external()
+            self.watcher.before_write()
+    
+    def poll_external(self):
+        self.check_external()
+        self.root.after(EXTERNAL_POLL_MS, self.poll_external)
+    
+    def check_external(self):
+        # The conflict dialog runs a nested event loop; no write or second merge until the choice is applied
+        if self.checking:
+            return
+        self.checking = True
+        try:
+            self.merge_external()
+        finally:
+            self.checking = False
+
+    def merge_external(self):
+        # Take what only the other machine changed; ask which side wins where both did
+        try:
+            theirs = self.watcher.poll()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read outside changes: {e}")
+            return
+        if theirs is None:
+            return
+        changes, conflicts = plan_merge(self.watcher.base, EnginePlaces(self.engine), theirs)
+        restated = []
+        # Places they deleted whose people we never loaded can only be deleted here too
+        forced = [conflict for conflict in conflicts if not can_keep_ours(self.engine, conflict)]
+        conflicts = [conflict for conflict in conflicts if can_keep_ours(self.engine, conflict)]
+        note = ""
+        if forced:
+            for conflict in forced:
+                changes.extend(conflict.changes)
+            note = f"Deleted on another machine; their people were never loaded here, so these go too:\n\n{list_conflicts(forced)}"
+            if not conflicts:
+                messagebox.showinfo("Changed on another machine", note)
+        if conflicts:
+            keep_ours = messagebox.askyesno("Changed on another machine", f"Also changed on another machine:\n\n{list_conflicts(conflicts)}\n\nKeep your values? No takes theirs." + (f"\n\n{note}" if note else ""))
+            for conflict in conflicts:
+                if keep_ours:
+                    restated.extend(restate_records(self.engine, conflict))
+                else:
+                    changes.extend(conflict.changes)
+        self.merging = True
+        try:
+            apply_changes(self.engine, changes)
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to merge outside changes: {e}")
+        finally:
+            self.merging = False
+        self.watcher.accept(theirs)
+        self.pending_records = superseded(self.pending_records, changes) + restated
+        if restated:
+            self.saver.request()
+    
+    def show_changes(self, records):
+        # Redraw only the rows the changes touched, each once
+        rows = set()
+        structural = False
+        for record in records:
+            op = record["op"]
+            if op in ("set_place", "delta_place"):
+                rows.add(("place", record["place"]))
+            elif op in ("set_person", "delta_person"):
+                rows.add(("person", (record["place"], record["person"])))
+            else:
+                structural = True
+                if op == "delete_place":
+                    self.selection = {row for row in self.selection
+                                      if row != ("place", record["place"]) and (row[0] == "place" or row[1][0] != record["place"])}
+                elif op == "delete_person":
+                    self.selection.discard(("person", (record["place"], record["person"])))
+            if self.propagator is not None and "person" in record:
+                rows.add(("place", record["place"]))
+        if structural:
+            if self.search_results is not None:
+                self.search_results = self.search.run(self.search_var.get())
+            self.update_rows()
+            self.update_selection_label()
+        for kind, key in rows:
+            self.view.refresh_row(kind, key)
+    
+    def undo(self):
+        try:
+            self.undo_stack.undo()
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot undo: {e}")
+    
+    def redo(self):
+        try:
+            self.undo_stack.redo()
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot redo: {e}")
+    
+    def change_session(self):
+        try:
+            self.history.start_session(int(self.session_var.get()))
+            self.saver.request()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid session: {e}")
+            self.session_var.set(str(self.history.session))
+    
+    def schedule_search(self):
+        # Debounced so a filter runs once typing pauses
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.apply_search)
+    
+    def apply_search(self):
+        self.search_job = None
+        self.search_results = self.search.run(self.search_var.get())
+        if self.search_results is not None:
+            # Open the places of the matches; lazy places start collapsed
+            for place, people in self.search_results.items():
+                if people:
+                    self.place_visibility[place] = True
+        self.canvas.yview_moveto(0)
+        self.update_rows()
+    
+    def show_history(self):
+        # People of places never expanded have no rows yet; read their starting values so past sessions list them
+        for place in self.engine.place_names():
+            if not self.engine.is_loaded(place):
+                self.history.record_people_baseline(place, self.storage.load_people(place))
+        HistoryWindow(self.root, self.history)
+    
+    def toggle_server(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+            self.share_btn.configure(text="Share")
+            return
+        try:
+            server = SessionServer(self.engine, notify=lambda: self.root.after_idle(self.apply_player_edits), **load_server_config(SERVER_PATH))
+            server.start()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start sharing: {e}")
+            return
+        self.server = server
+        self.share_btn.configure(text=f"Stop Sharing (port {server.port})")
+    
+    def apply_player_edits(self):
+        # Players' edits come in on the server thread; it schedules this on the Tk thread when some arrive
+        if self.server is not None:
+            self.server.apply_edits()
+    
+    def on_close(self):
+        if self.server is not None:
+            self.server.stop()
+        self.saver.flush()
+        self.storage.close()
+        self.root.destroy()
+    
+    def display_rows(self):
+        return list(self.iter_display_rows())
+    
+    def iter_display_rows(self):
+        if not len(self.engine):
+            yield ("empty", None)
+            return
+        if self.search_results is not None:
+            shown = False
+            for place, people in self.search_results.items():
+                shown = True
+                yield ("place", place)
+                if self.place_visibility.get(place, True):
+                    yield from (("person", (place, person)) for person in people)
+            if not shown:
+                yield ("no_matches", None)
+            return
+        for place in self.engine.place_names():
+            yield ("place", place)
+            if self.place_visibility.get(place, True):
+                yield from (("person", (place, person)) for person in self.engine.people(place))
+    
+    def update_rows(self):
+        filling = self.fill_job is not None
+        if filling:
+            # A full list replaces the startup fill
+            self.root.after_cancel(self.fill_job)
+            self.fill_job = None
+        self.view.set_rows(self.display_rows())
+        if filling:
+            self.startup.mark("all rows")
+            self.startup.report()
+    
     def refresh_display(self):
-        for widget in self.display_frame.winfo_children():
-            widget.destroy()
+        # Full rebuild, kept as a fallback; edits use update_rows() and the keyed row updates below.
+        self.view.rows = []
+        self.view.reset()
+        self.update_rows()
+    
+    def make_row(self, kind):
+        row = {"key": None, "kind": kind}
+        if kind == "empty":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="No places added yet.").pack(pady=10)
+        elif kind == "loading":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="Loading...").pack(pady=10)
+        elif kind == "no_matches":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="No matches.").pack(pady=10)
+        elif kind == "place":
+            self.make_place_row(row)
+        else:
+            self.make_person_row(row)
+        return row
+    
+    def make_place_row(self, row):
+        place_frame = ttk.Frame(self.canvas, bootstyle="secondary", padding=10)
         
-        if not self.places:
-            ttk.Label(self.display_frame, text="No places added yet.").pack(pady=10)
-            return
+        row["selected"] = ttk.BooleanVar()
+        ttk.Checkbutton(place_frame, variable=row["selected"], command=lambda r=row: self.toggle_selected(r)).pack(side=LEFT)
+        header_frame = ttk.Frame(place_frame)
+        header_frame.pack(side=LEFT, fill=X, expand=True)
         
-        for place in self.places:
-            place_frame = ttk.Frame(self.display_frame, bootstyle="secondary", padding=10)
-            place_frame.pack(fill=X, padx=5, pady=5)
-            
-            header_frame = ttk.Frame(place_frame)
-            header_frame.pack(fill=X)
-            
-            # Reputation controls for the place
-            ttk.Button(header_frame, text="-5", bootstyle="info", command=lambda p=place: self.modify_place_reputation(p, -5)).grid(row=0, column=0, padx=2)
-            ttk.Button(header_frame, text="-", bootstyle="info", command=lambda p=place: self.modify_place_reputation(p, -1)).grid(row=0, column=1, padx=2)
-            
-            name_label = ttk.Label(header_frame, text=place, font=("Helvetica", 12, "bold"))
-            name_label.grid(row=0, column=2, sticky="w", padx=5)
-            
-            ttk.Button(header_frame, text="+", bootstyle="info", command=lambda p=place: self.modify_place_reputation(p, 1)).grid(row=0, column=3, padx=2)
-            ttk.Button(header_frame, text="+5", bootstyle="info", command=lambda p=place: self.modify_place_reputation(p, 5)).grid(row=0, column=4, padx=2)
-            
-            rep_entry = ttk.Entry(header_frame, width=5, justify="center", font=("Helvetica", 14))
-            rep_entry.insert(0, str(self.places[place]["reputation"]))
-            rep_entry.grid(row=0, column=5, padx=2)
-            rep_entry.bind("<Return>", lambda e, p=place, entry=rep_entry: self.set_place_reputation(p, entry.get()))
-            
-            # Add People button for the place
-            ttk.Button(header_frame, text="Add People", bootstyle="info", command=lambda p=place: self.add_people(p)).grid(row=0, column=6, padx=5)
-            # Hide/Show button for people under the place
-            btn_text = "Hide" if self.place_visibility.get(place, True) else "Show"
-            ttk.Button(header_frame, text=btn_text, bootstyle="secondary", command=lambda p=place: self.toggle_visibility(p)).grid(row=0, column=7, padx=5)
-            # Delete Place button
-            ttk.Button(header_frame, text="X", bootstyle="danger", command=lambda p=place: self.delete_place(p)).grid(row=0, column=8, padx=2)
-            
-            # People display frame
-            people_frame = ttk.Frame(place_frame)
-            people_frame.pack(fill=X, padx=10, pady=5)
-            
-            if self.place_visibility.get(place, True):
-                for person, rep in self.places[place].get("people", {}).items():
-                    person_frame = ttk.Frame(people_frame)
-                    person_frame.pack(fill=X, pady=2)
-                    # Layout: [Name]  -5, -, [number], +, +5
-                    ttk.Label(person_frame, text=person, font=("Helvetica", 10)).grid(row=0, column=0, padx=5, sticky=W)
-                    ttk.Button(person_frame, text="-5", bootstyle="info", command=lambda p=place, person=person: self.modify_person_reputation(p, person, -5)).grid(row=0, column=1, padx=2)
-                    ttk.Button(person_frame, text="-", bootstyle="info", command=lambda p=place, person=person: self.modify_person_reputation(p, person, -1)).grid(row=0, column=2, padx=2)
-                    
-                    entry = ttk.Entry(person_frame, width=5, justify="center", font=("Helvetica", 10))
-                    entry.insert(0, str(rep))
-                    entry.grid(row=0, column=3, padx=2)
-                    entry.bind("<Return>", lambda e, p=place, person=person, entry=entry: self.set_person_reputation(p, person, entry.get()))
-                    
-                    ttk.Button(person_frame, text="+", bootstyle="info", command=lambda p=place, person=person: self.modify_person_reputation(p, person, 1)).grid(row=0, column=4, padx=2)
-                    ttk.Button(person_frame, text="+5", bootstyle="info", command=lambda p=place, person=person: self.modify_person_reputation(p, person, 5)).grid(row=0, column=5, padx=2)
+        # Reputation controls for the place
+        ttk.Button(header_frame, text="-5", bootstyle="info", command=lambda r=row: self.modify_place_reputation(r["key"], -5)).grid(row=0, column=0, padx=2)
+        ttk.Button(header_frame, text="-", bootstyle="info", command=lambda r=row: self.modify_place_reputation(r["key"], -1)).grid(row=0, column=1, padx=2)
+        
+        name_label = ttk.Label(header_frame, font=("Helvetica", 12, "bold"))
+        name_label.grid(row=0, column=2, sticky="w", padx=5)
+        
+        ttk.Button(header_frame, text="+", bootstyle="info", command=lambda r=row: self.modify_place_reputation(r["key"], 1)).grid(row=0, column=3, padx=2)
+        ttk.Button(header_frame, text="+5", bootstyle="info", command=lambda r=row: self.modify_place_reputation(r["key"], 5)).grid(row=0, column=4, padx=2)
+        
+        rep_entry = ttk.Entry(header_frame, width=5, justify="center", font=("Helvetica", 14))
+        rep_entry.grid(row=0, column=5, padx=2)
+        rep_entry.bind("<Return>", lambda e, r=row: self.set_place_reputation(r["key"], r["entry"].get()))
+        
+        # Add People button for the place
+        ttk.Button(header_frame, text="Add People", bootstyle="info", command=lambda r=row: self.add_people(r["key"])).grid(row=0, column=6, padx=5)
+        # Hide/Show button for people under the place
+        toggle_btn = ttk.Button(header_frame, bootstyle="secondary", command=lambda r=row: self.toggle_visibility(r["key"]))
+        toggle_btn.grid(row=0, column=7, padx=5)
+        # Delete Place button
+        ttk.Button(header_frame, text="X", bootstyle="danger", command=lambda r=row: self.delete_place(r["key"])).grid(row=0, column=8, padx=2)
+        
+        row.update(frame=place_frame, label=name_label, entry=rep_entry, toggle=toggle_btn)
+    
+    def make_person_row(self, row):
+        # Indented under its place, like the old nested people frame
+        person_frame = ttk.Frame(self.canvas, padding=(20, 2, 10, 2))
+        # Layout: [x] [Name]  -5, -, [number], +, +5
+        row["selected"] = ttk.BooleanVar()
+        ttk.Checkbutton(person_frame, variable=row["selected"], command=lambda r=row: self.toggle_selected(r)).grid(row=0, column=6, padx=5)
+        name_label = ttk.Label(person_frame, font=("Helvetica", 10))
+        name_label.grid(row=0, column=0, padx=5, sticky=W)
+        ttk.Button(person_frame, text="-5", bootstyle="info", command=lambda r=row: self.modify_person_reputation(*r["key"], -5)).grid(row=0, column=1, padx=2)
+        ttk.Button(person_frame, text="-", bootstyle="info", command=lambda r=row: self.modify_person_reputation(*r["key"], -1)).grid(row=0, column=2, padx=2)
+        
+        entry = ttk.Entry(person_frame, width=5, justify="center", font=("Helvetica", 10))
+        entry.grid(row=0, column=3, padx=2)
+        entry.bind("<Return>", lambda e, r=row: self.set_person_reputation(*r["key"], r["entry"].get()))
+        
+        ttk.Button(person_frame, text="+", bootstyle="info", command=lambda r=row: self.modify_person_reputation(*r["key"], 1)).grid(row=0, column=4, padx=2)
+        ttk.Button(person_frame, text="+5", bootstyle="info", command=lambda r=row: self.modify_person_reputation(*r["key"], 5)).grid(row=0, column=5, padx=2)
+        
+        row.update(frame=person_frame, label=name_label, entry=entry)
+    
+    def bind_row(self, row, kind, key):
+        row["key"] = key
+        if "selected" in row:
+            row["selected"].set((kind, key) in self.selection)
+        if kind == "place":
+            row["label"].configure(text=self.place_title(key))
+            self.set_entry_text(row["entry"], self.engine.place_reputation(key))
+            row["toggle"].configure(text="Hide" if self.place_visibility.get(key, True) else "Show")
+        elif kind == "person":
+            place, person = key
+            row["label"].configure(text=person)
+            self.set_entry_text(row["entry"], self.engine.person_reputation(place, person))
+    
+    def place_title(self, place):
+        # Name plus the derived score when propagation is on
+        if self.propagator is None or self.propagator.mode is None:
+            return place
+        return f"{place} ({self.propagator.derived_reputation(place)})"
+    
+    def set_entry_text(self, entry, value):
+        entry.delete(0, END)
+        entry.insert(0, str(value))
     
     def add_place(self):
         place_name = simpledialog.askstring("Add Place", "Enter place name:")
-        if place_name and place_name not in self.places:
-            self.places[place_name] = {"reputation": 50, "people": {}}
-            self.save_data()
-            self.refresh_display()
+        if place_name and not self.engine.has_place(place_name):
+            self.engine.add_place(place_name)
         elif place_name:
             messagebox.showerror("Error", "Place already exists!")
     
     def add_people(self, place_name):
         person_name = simpledialog.askstring("Add Person", "Enter person's name:")
         if person_name:
-            if person_name in self.places[place_name]["people"]:
+            if self.engine.has_person(place_name, person_name):
                 messagebox.showerror("Error", "Person already exists!")
             else:
-                self.places[place_name]["people"][person_name] = 50
-                self.save_data()
-                self.refresh_display()
+                self.engine.add_person(place_name, person_name)
     
     def delete_place(self, place_name):
         if messagebox.askyesno("Confirm", f"Delete place '{place_name}'?"):
-            del self.places[place_name]
-            self.save_data()
-            self.refresh_display()
+            self.engine.delete_place(place_name)
     
     def modify_place_reputation(self, place_name, delta):
-        self.places[place_name]["reputation"] = max(0, min(100, self.places[place_name]["reputation"] + delta))
-        self.save_data()
-        self.refresh_display()
+        self.engine.modify_place_reputation(place_name, delta)
     
     def set_place_reputation(self, place_name, value_str):
         try:
             value = int(value_str)
             if 0 <= value <= 100:
-                self.places[place_name]["reputation"] = value
-                self.save_data()
-                self.refresh_display()
+                self.engine.set_place_reputation(place_name, value)
             else:
                 messagebox.showerror("Error", "Reputation must be 0-100.")
         except ValueError:
             messagebox.showerror("Error", "Invalid number.")
     
     def modify_person_reputation(self, place_name, person_name, delta):
-        current = self.places[place_name]["people"][person_name]
-        new_value = max(0, min(100, current + delta))
-        self.places[place_name]["people"][person_name] = new_value
-        self.save_data()
-        self.refresh_display()
+        self.engine.modify_person_reputation(place_name, person_name, delta)
     
     def set_person_reputation(self, place_name, person_name, value_str):
         try:
             value = int(value_str)
             if 0 <= value <= 100:
-                self.places[place_name]["people"][person_name] = value
-                self.save_data()
-                self.refresh_display()
+                self.engine.set_person_reputation(place_name, person_name, value)
             else:
                 messagebox.showerror("Error", "Reputation must be 0-100.")
         except ValueError:
@@ -180,7 +598,77 @@ class ReputationTrackerGUI:
     
     def toggle_visibility(self, place_name):
         self.place_visibility[place_name] = not self.place_visibility.get(place_name, True)
-        self.refresh_display()
+        self.update_rows()
+    
+    def toggle_selected(self, row):
+        if row["selected"].get():
+            self.selection.add((row["kind"], row["key"]))
+        else:
+            self.selection.discard((row["kind"], row["key"]))
+        self.update_selection_label()
+    
+    def select_shown(self):
+        self.selection.update(row for row in self.view.rows if row[0] in ("place", "person"))
+        self.refresh_selection()
+    
+    def clear_selection(self):
+        self.selection.clear()
+        self.refresh_selection()
+    
+    def refresh_selection(self):
+        for kind, key in list(self.view.visible):
+            self.view.refresh_row(kind, key)
+        self.update_selection_label()
+    
+    def update_selection_label(self):
+        self.selection_label.configure(text=f"{len(self.selection)} selected")
+    
+    def selected_entities(self):
+        # (place, person) pairs, person None for a place
+        if not self.selection:
+            messagebox.showerror("Error", "Select places or people first.")
+            return None
+        return [(key, None) if kind == "place" else key for kind, key in self.selection]
+    
+    def bulk_value(self):
+        try:
+            return int(self.bulk_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Invalid number.")
+            return None
+    
+    def bulk_add(self):
+        entities = self.selected_entities()
+        delta = self.bulk_value() if entities else None
+        if delta is not None:
+            self.engine.add_many(entities, delta)
+    
+    def bulk_set(self):
+        entities = self.selected_entities()
+        value = self.bulk_value() if entities else None
+        if value is None:
+            return
+        if 0 <= value <= 100:
+            self.engine.set_many(entities, value)
+        else:
+            messagebox.showerror("Error", "Reputation must be 0-100.")
+    
+    def bulk_toward(self):
+        entities = self.selected_entities()
+        target = self.bulk_value() if entities else None
+        if target is None:
+            return
+        if not 0 <= target <= 100:
+            messagebox.showerror("Error", "Reputation must be 0-100.")
+            return
+        fraction = simpledialog.askfloat("Scale Toward", f"Fraction of the way toward {target} (0-1):", minvalue=0.0, maxvalue=1.0)
+        if fraction is not None:
+            self.engine.scale_toward(entities, target, fraction)
+    
+    def bulk_reset(self):
+        entities = self.selected_entities()
+        if entities:
+            self.engine.set_many(entities, DEFAULT_REPUTATION)
 
 if __name__ == "__main__":
     root = ttk.Window(themename="darkly")
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+
+from persistence import atomic_write_json
+
+
+def journal_path_for(snapshot_path):
+    """Return the journal file that sits next to a snapshot file."""
+    return os.path.splitext(snapshot_path)[0] + ".journal"
+
+
+def apply_record(places, record):
+    """Apply one journal record to a places dict.
+
+    Delta records carry the resulting value, so every record is idempotent and
+    replaying a journal over a snapshot that already contains some of its
+    records gives the same result. Records for places or people that no
+    longer exist are skipped.
+    """
+    op = record["op"]
+    place = record["place"]
+    if op == "add_place":
+        places[place] = {"reputation": 50, "people": {}}
+        return
+    if op == "delete_place":
+        places.pop(place, None)
+        return
+    if place not in places:
+        return
+    people = places[place]["people"]
+    if op in ("set_place", "delta_place"):
+        places[place]["reputation"] = record["value"]
+    elif op == "add_person":
+        people[record["person"]] = record.get("value", 50)
+    elif op == "delete_person":
+        people.pop(record["person"], None)
+    elif op in ("set_person", "delta_person"):
+        if record["person"] in people:
+            people[record["person"]] = record["value"]
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+class Journal:
+    """Append-only log of reputation changes kept next to the JSON snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, records):
+        """Append records as JSON lines, stamping each with the time it was written.
+
+        Returns the number of bytes appended.
+        """
+        if not records:
+            return 0
+        now = time.time()
+        lines = [json.dumps(dict(record, ts=record.get("ts", now)), separators=(",", ":")) for record in records]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with open(self.path, "a+b") as f:
+            # Finish a line torn by a crash mid-append so the first record gets a line of its own
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(data)
+
+    def records(self):
+        """Yield the journal records in order, skipping lines torn by a crash mid-append."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A partial line; append() starts a new line after it, so later records still count
+                    continue
+
+    def replay(self, places):
+        """Apply every journal record to places and return how many were applied."""
+        count = 0
+        for record in self.records():
+            apply_record(places, record)
+            count += 1
+        return count
+
+    def size(self):
+        """Return the journal size in bytes."""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def truncate(self):
+        """Empty the journal."""
+        if os.path.exists(self.path):
+            with open(self.path, "w"):
+                pass
+
+    def compact(self, snapshot_path, places):
+        """Fold the journal into a new snapshot, then empty it.
+
+        A crash between the two steps is harmless because records are idempotent.
+        Returns the size of the new snapshot in bytes.
+        """
+        size = atomic_write_json(snapshot_path, places)
+        self.truncate()
+        return size
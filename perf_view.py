@@ -0,0 +1,85 @@
+import tkinter as tk
+from tkinter import messagebox
+
+from instrumentation import FRAME_BUDGET_MS
+
+# How often the overlay redraws its numbers while it is shown
+OVERLAY_REFRESH_MS = 500
+
+
+class PerfOverlay:
+    """Panel drawn over a widget (the row canvas) with live numbers from an Instruments.
+
+    Timers are listed by total time spent, so the operation eating the frame
+    budget is at the top. Showing the panel enables the instruments; hiding
+    it leaves them recording.
+    """
+
+    def __init__(self, over, instruments, dump_path):
+        self.over = over
+        self.instruments = instruments
+        self.dump_path = dump_path
+        self.job = None
+        # A sibling of the covered widget, so rows drawn inside it never end up on top
+        self.frame = tk.Frame(over.master, background="#202020", padx=6, pady=4)
+        self.text = tk.Label(self.frame, justify=tk.LEFT, anchor="nw", font=("Courier", 8),
+                             background="#202020", foreground="#e0e0e0")
+        self.text.pack(fill=tk.BOTH)
+        buttons = tk.Frame(self.frame, background="#202020")
+        buttons.pack(fill=tk.X, pady=(4, 0))
+        tk.Button(buttons, text="Reset", command=self.reset).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Dump JSON", command=self.dump).pack(side=tk.LEFT, padx=4)
+        tk.Button(buttons, text="Hide", command=self.hide).pack(side=tk.RIGHT)
+
+    @property
+    def shown(self):
+        return self.job is not None
+
+    def toggle(self):
+        if self.shown:
+            self.hide()
+        else:
+            self.show()
+
+    def show(self):
+        self.instruments.enable()
+        self.frame.place(in_=self.over, relx=1.0, x=-4, y=4, anchor="ne")
+        self.frame.lift()
+        self.update()
+
+    def hide(self):
+        if self.job is not None:
+            self.over.after_cancel(self.job)
+            self.job = None
+        self.frame.place_forget()
+
+    def update(self):
+        self.text.configure(text="\n".join(self.lines()))
+        self.job = self.over.after(OVERLAY_REFRESH_MS, self.update)
+
+    def lines(self):
+        instruments = self.instruments
+        lines = [f"{'operation':24}{'calls':>6}{'p50':>7}{'p95':>7}{'max':>8}{'>' + format(FRAME_BUDGET_MS, 'g'):>7}"]
+        for name in instruments.slowest():
+            timer = instruments.timers[name]
+            if timer.calls:
+                lines.append(f"{name:24}{timer.calls:6}{timer.percentile(0.5):7.1f}{timer.percentile(0.95):7.1f}"
+                             f"{timer.max_ms:8.1f}{timer.over_budget:7}")
+        for name, tally in sorted(instruments.tallies.items()):
+            if tally.calls:
+                lines.append(f"{name}: last {tally.last}, mean {tally.mean():.0f}, total {tally.total}")
+        if len(lines) == 1:
+            lines.append("no calls yet")
+        return lines
+
+    def reset(self):
+        self.instruments.reset()
+        self.text.configure(text="\n".join(self.lines()))
+
+    def dump(self):
+        try:
+            path = self.instruments.dump(self.dump_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to write performance data: {e}")
+            return
+        messagebox.showinfo("Performance", f"Performance data written to {path}")
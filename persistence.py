@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import tempfile
+
+
+def atomic_write_json(path, data):
+    """Write data as JSON through a temp file in the same folder, then rename it over path.
+
+    The rename is atomic, so a crash mid-write leaves either the old or the new
+    file on disk, never a truncated one. Returns the number of bytes written.
+    """
+    directory = os.path.dirname(path) or "."
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".reputation-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+class WriteBehindSaver:
+    """Coalesce bursts of save requests into one flush on the Tk event loop.
+
+    A flush runs once no request arrived for quiet_ms, or at the latest
+    max_delay_ms after the first unsaved request, whichever comes first.
+    """
+
+    def __init__(self, root, flush_callback, quiet_ms=500, max_delay_ms=3000):
+        self.root = root
+        self.flush_callback = flush_callback
+        self.quiet_ms = quiet_ms
+        self.max_delay_ms = max_delay_ms
+        self.dirty_since = None
+        self.pending = None
+
+    def request(self):
+        """Mark the data dirty and (re)schedule the flush."""
+        now = time.monotonic()
+        if self.dirty_since is None:
+            self.dirty_since = now
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+        remaining_ms = self.max_delay_ms - (now - self.dirty_since) * 1000
+        delay = max(0, int(min(self.quiet_ms, remaining_ms)))
+        self.pending = self.root.after(delay, self.flush)
+
+    def flush(self):
+        """Run the flush now if anything is unsaved."""
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+        if self.dirty_since is None:
+            return
+        self.dirty_since = None
+        self.flush_callback()
+
+    @property
+    def dirty(self):
+        return self.dirty_since is not None
@@ -0,0 +1,117 @@
+import os
+import json
+import string
+import hashlib
+import operator
+from collections import OrderedDict
+
+from persistence import atomic_write_json
+
+# Prompts a cache keeps by default; small enough that a batch of any size runs in constant memory
+CACHE_ENTRIES = 1024
+
+
+class Template:
+    """A text template with {field} placeholders, compiled once for fast rendering.
+
+    Compiling turns the template into a %-format string plus one itemgetter for
+    its fields, so rendering is a single C-level formatting call per prompt.
+    """
+
+    def __init__(self, text, path=None):
+        self.text = text
+        self.path = path
+        self.digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        pieces = []
+        self.fields = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            pieces.append(literal.replace("%", "%%"))
+            if field is None:
+                continue
+            if not field.isidentifier() or format_spec or conversion:
+                raise ValueError(f"Unsupported placeholder {{{field}}} in template {path or '<string>'}")
+            pieces.append("%s")
+            self.fields.append(field)
+        self.format = "".join(pieces)
+        if len(self.fields) == 1:
+            field = self.fields[0]
+            self.getter = lambda values: (values[field],)
+        elif self.fields:
+            self.getter = operator.itemgetter(*self.fields)
+        else:
+            self.getter = lambda values: ()
+
+    def render(self, values):
+        """Fill the template from a dict holding at least every field it uses."""
+        return self.format % self.getter(values)
+
+    def key(self, values):
+        """Hash of this template and the values it would use, for caching rendered output."""
+        used = json.dumps(self.getter(values), ensure_ascii=False)
+        return hashlib.blake2b(f"{self.digest}\x00{used}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def load_template(path):
+    """Read and compile a template file; the file's final newline is not part of the template."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        text = f.read()
+    if text.endswith("\n"):
+        text = text[:-1]
+    return Template(text, path)
+
+
+class PromptCache:
+    """LRU cache from a template key to rendered text, optionally saved to disk.
+
+    max_entries=None leaves it unbounded, for a cache file that has to hold
+    every prompt of a roster to be of any use on the next run.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        text = self.entries.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        if self.max_entries is not None and self.max_entries <= 0:
+            return
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while self.max_entries is not None and len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.entries), "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def load(self):
+        """Read saved entries, oldest first, keeping at most max_entries of the newest."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["entries"]
+        if self.max_entries is not None:
+            entries = entries[-self.max_entries:] if self.max_entries > 0 else ()
+        for key, text in entries:
+            self.entries[key] = text
+
+    def save(self):
+        if self.path is not None:
+            atomic_write_json(self.path, {"entries": list(self.entries.items())})
@@ -0,0 +1,129 @@
+import os
+import json
+
+PROPAGATION_MODES = (None, "mean", "blend")
+
+
+class Propagator:
+    """Derived place scores and reputation ripples, kept up to date from engine records.
+
+    mode "mean" derives a place's score from the weighted mean of its people;
+    "blend" mixes that mean with the place's own base score as
+    blend * base + (1 - blend) * mean. None keeps the base score.
+
+    weights maps (place, person) to that person's weight in the mean (default 1).
+    links maps a source (place, person) - person None for a place - to a list of
+    ((place, person), weight) targets; a change of d at the source adds
+    round(d * weight) to every target. Ripples go one hop, so a change costs
+    O(degree) and cycles in the graph cannot loop.
+    """
+
+    def __init__(self, engine, mode="mean", blend=0.5, weights=None, links=None):
+        if mode not in PROPAGATION_MODES:
+            raise ValueError(f"Unknown propagation mode: {mode}")
+        self.engine = engine
+        self.mode = mode
+        self.blend = blend
+        self.weights = weights or {}
+        self.links = links or {}
+        # place -> [weighted sum of people, total weight], built on first use
+        self.aggregates = {}
+        self.rippling = False
+        engine.subscribe(self.on_change)
+
+    def reset(self):
+        """Forget all running aggregates, e.g. after the engine was reloaded."""
+        self.aggregates = {}
+
+    def weight(self, place, person):
+        return self.weights.get((place, person), 1.0)
+
+    def aggregate(self, place):
+        """Return the running [weighted sum, total weight] of a place's people."""
+        aggregate = self.aggregates.get(place)
+        if aggregate is None:
+            aggregate = [0.0, 0.0]
+            for person in self.engine.people(place):
+                weight = self.weight(place, person)
+                aggregate[0] += weight * self.engine.person_reputation(place, person)
+                aggregate[1] += weight
+            self.aggregates[place] = aggregate
+        return aggregate
+
+    def derived_reputation(self, place):
+        """Return the score shown for a place; O(1) once its aggregate exists."""
+        base = self.engine.place_reputation(place)
+        if self.mode is None or not self.engine.is_loaded(place):
+            return base
+        total, weight = self.aggregate(place)
+        if weight <= 0:
+            return base
+        mean = total / weight
+        if self.mode == "mean":
+            return round(mean)
+        return round(self.blend * base + (1 - self.blend) * mean)
+
+    def on_change(self, record):
+        op = record["op"]
+        place = record["place"]
+        person = record.get("person")
+        if op in ("add_place", "delete_place"):
+            self.aggregates.pop(place, None)
+            return
+        if op in ("set_place", "delta_place"):
+            self.ripple((place, None), record["value"] - record["old"])
+            return
+        aggregate = self.aggregates.get(place)
+        weight = self.weight(place, person)
+        if op == "add_person":
+            if aggregate is not None:
+                aggregate[0] += weight * record["value"]
+                aggregate[1] += weight
+        elif op == "delete_person":
+            if aggregate is not None:
+                aggregate[0] -= weight * record["old"]
+                aggregate[1] -= weight
+        else:
+            change = record["value"] - record["old"]
+            if aggregate is not None:
+                aggregate[0] += weight * change
+            self.ripple((place, person), change)
+
+    def ripple(self, source, change):
+        """Push a change at source to its linked targets in one batched engine call."""
+        if self.rippling or self.engine.replaying or not change:
+            return
+        deltas = []
+        for (place, person), weight in self.links.get(source, ()):
+            delta = round(change * weight)
+            if not delta or not self.engine.has_place(place):
+                continue
+            if person is None or self.engine.has_person(place, person):
+                deltas.append((place, person, delta))
+        if not deltas:
+            return
+        self.rippling = True
+        try:
+            self.engine.apply_deltas(deltas)
+        finally:
+            self.rippling = False
+
+
+def load_propagator(engine, path):
+    """Build a Propagator from a relations file, or return None if there is none.
+
+    The file is JSON like:
+        {"mode": "blend", "blend": 0.5,
+         "weights": [["Town", "Mayor", 3]],
+         "links": [["Town", "Mayor", "Thieves' Guild", null, -0.5]]}
+    where a null person means the place itself.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        config = json.load(f)
+    weights = {(place, person): weight for place, person, weight in config.get("weights", [])}
+    links = {}
+    for place, person, target_place, target_person, weight in config.get("links", []):
+        links.setdefault((place, person), []).append(((target_place, target_person), weight))
+    return Propagator(engine, config.get("mode"), config.get("blend", 0.5), weights, links)
@@ -1,13 +1,63 @@
 import os
-import json
+import itertools
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox
+from virtual_list import VirtualList
+from persistence import WriteBehindSaver
+from storage import open_storage
+from engine import ReputationEngine, DEFAULT_REPUTATION
+from propagation import load_propagator
+from history import History
+from history_view import HistoryWindow
+from search import Search
+from undo import UndoStack
+from startup import BackgroundTask, StartupTimer
+from instrumentation import Instruments, enabled_by_env
+from perf_view import PerfOverlay
+from sync import (ExternalWatcher, EnginePlaces, plan_merge, apply_changes, restate_records, superseded,
+                  can_keep_ours, list_conflicts)
+from server import SessionServer, load_server_config
 
-# Define the file path to save reputation data
+# Define the file path to save reputation data; a .db/.sqlite path uses the SQLite backend and
+# a .snap path the compact binary snapshot (binsnap.py)
 FILE_PATH = r"C:\Users\saqom\OneDrive\Deskto\Folders\vscode folder\reputation\reputation.json"
 
+# Edits are saved once no new edit arrived for SAVE_QUIET_MS, and never later
+# than SAVE_MAX_DELAY_MS after the first unsaved edit
+SAVE_QUIET_MS = 500
+SAVE_MAX_DELAY_MS = 3000
+
+# FILE_PATH may sit in a synced folder shared with another machine; its files are checked for
+# outside changes every EXTERNAL_POLL_MS and before every save, and those changes merged in.
+# This covers .json and .snap files; a SQLite database is not watched, so do not share one
+EXTERNAL_POLL_MS = 2000
+
+# Optional propagation settings (derived place scores, relationship links); see propagation.py
+RELATIONS_PATH = os.path.splitext(FILE_PATH)[0] + ".relations.json"
+
+# Columnar timeline of every change, tagged with the session number from the top bar
+HISTORY_DIR = os.path.splitext(FILE_PATH)[0] + ".history"
+
+# The search box filters once typing pauses for SEARCH_DELAY_MS
+SEARCH_DELAY_MS = 150
+
+# After startup the row list is filled RENDER_CHUNK rows per event-loop turn
+RENDER_CHUNK = 2000
+
+# Performance numbers from the F12 overlay are dumped here; set REPUTATION_INSTRUMENT=1
+# to record them from startup
+PERF_PATH = os.path.splitext(FILE_PATH)[0] + ".perf.json"
+
+# "Share" serves the data to players' machines (see server.py); host, port and access tokens
+# come from SERVER_PATH, which has to name a host such as "0.0.0.0" before other machines can join
+SERVER_PATH = os.path.splitext(FILE_PATH)[0] + ".server.json"
+
+# Fixed pixel height of each kind of row in the virtualized display
+ROW_HEIGHTS = {"place": 62, "person": 36, "no_people": 28, "empty": 40, "no_matches": 40, "loading": 40}
+
 class ReputationTrackerGUI:
     def __init__(self, root):
+        self.startup = StartupTimer()
         self.root = root
         self.root.title("D&D Reputation Tracker")
         self.root.geometry("600x600")
@@ -32,216 +82,751 @@ class ReputationTrackerGUI:
         header_label = ttk.Label(main_frame, text="D&D Reputation Tracker", style="Header.TLabel")
         header_label.pack(pady=10)
         
-        # Top frame for adding new places
+        # Top frame for adding new places; the toolbars are packed once the data is loaded
         top_frame = ttk.Frame(main_frame)
-        top_frame.pack(fill=tk.X, pady=5)
+        self.toolbars = [(top_frame, {"fill": tk.X, "pady": 5})]
         add_place_btn = ttk.Button(top_frame, text="Add Place", command=self.add_place)
         add_place_btn.pack(side=tk.LEFT)
         
+        # Undo/redo of whole edits, including bulk edits
+        ttk.Button(top_frame, text="Undo", width=5, command=self.undo).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(top_frame, text="Redo", width=5, command=self.redo).pack(side=tk.LEFT, padx=2)
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
+        self.root.bind("<Control-Z>", lambda e: self.redo())
+        
+        # Live filter by name and reputation, e.g. "guard", "hostile" or "smith >= 60"
+        ttk.Label(top_frame, text="Search:").pack(side=tk.LEFT, padx=(10, 0))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(top_frame, width=18, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        self.search_job = None
+        self.search_results = None
+        
+        # Session tag for the change history, and the history viewer
+        history_btn = ttk.Button(top_frame, text="History", command=self.show_history)
+        history_btn.pack(side=tk.RIGHT)
+        self.share_btn = ttk.Button(top_frame, text="Share", command=self.toggle_server)
+        self.share_btn.pack(side=tk.RIGHT, padx=(0, 5))
+        self.server = None
+        self.session_var = tk.StringVar()
+        session_box = ttk.Spinbox(top_frame, from_=1, to=9999, width=5, textvariable=self.session_var,
+                                  command=self.change_session)
+        session_box.bind("<Return>", lambda e: self.change_session())
+        session_box.pack(side=tk.RIGHT, padx=5)
+        ttk.Label(top_frame, text="Session:").pack(side=tk.RIGHT)
+        
+        # Bulk edits on the checked places and people; each is one engine transaction
+        self.selection = set()
+        bulk_frame = ttk.Frame(main_frame)
+        self.toolbars.append((bulk_frame, {"fill": tk.X, "pady": (0, 5)}))
+        ttk.Button(bulk_frame, text="Select Shown", command=self.select_shown).pack(side=tk.LEFT)
+        ttk.Button(bulk_frame, text="Clear", command=self.clear_selection).pack(side=tk.LEFT, padx=2)
+        self.selection_label = ttk.Label(bulk_frame, text="0 selected")
+        self.selection_label.pack(side=tk.LEFT, padx=5)
+        ttk.Button(bulk_frame, text="Reset to 50", command=self.bulk_reset).pack(side=tk.RIGHT)
+        ttk.Button(bulk_frame, text="Toward", command=self.bulk_toward).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(bulk_frame, text="Set", command=self.bulk_set).pack(side=tk.RIGHT)
+        ttk.Button(bulk_frame, text="Add", command=self.bulk_add).pack(side=tk.RIGHT, padx=2)
+        self.bulk_entry = ttk.Entry(bulk_frame, width=5, justify="center")
+        self.bulk_entry.insert(0, "5")
+        self.bulk_entry.pack(side=tk.RIGHT, padx=2)
+        
         # Canvas for scrollable display of places/people
         self.canvas = tk.Canvas(main_frame, background="#f0f0f0")
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=self.canvas.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        
-        self.display_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.display_frame, anchor="nw")
-        self.display_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        
-        # Load saved data or initialize new data
-        self.places = self.load_data()
-        self.refresh_display()
-        
-    def load_data(self):
-        """Load reputation data from file, or return an empty dict if not available."""
-        if os.path.exists(FILE_PATH):
-            try:
-                with open(FILE_PATH, "r") as f:
-                    return json.load(f)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load data: {e}")
-        return {}
+        
+        # Virtualized rows: only places/people in view (plus overscan) have widgets,
+        # and those widgets are reused as the canvas scrolls.
+        self.view = VirtualList(self.canvas, scrollbar, ROW_HEIGHTS, self.make_row, self.bind_row)
+        self.fill_job = None
+        
+        # Batch rapid edits into one storage write and flush it when the window closes
+        self.storage = open_storage(FILE_PATH)
+        self.pending_records = []
+        self.watcher = ExternalWatcher(self.storage)
+        self.merging = False
+        # True while outside changes are merged, conflict dialog included; writes wait for it
+        self.checking = False
+        self.saver = WriteBehindSaver(root, self.flush_changes, SAVE_QUIET_MS, SAVE_MAX_DELAY_MS)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # The data lives in the headless engine; its change records drive saving and redrawing
+        self.engine = ReputationEngine(self.load_people)
+        # Propagation and the search index see each record before the rows redraw,
+        # which happens once per commit (one edit, or one bulk edit)
+        self.propagator = self.load_propagator()
+        self.search = Search(self.engine, self.storage.find_people)
+        self.engine.subscribe_commits(self.on_changes)
+        self.undo_stack = UndoStack(self.engine)
+        self.history = None
+        
+        # Opt-in timers around the hot paths; F12 shows them over the rows
+        self.instruments = Instruments()
+        self.instrument()
+        self.perf_overlay = PerfOverlay(self.canvas, self.instruments, PERF_PATH)
+        self.root.bind("<F12>", lambda e: self.perf_overlay.toggle())
+        if enabled_by_env():
+            self.instruments.enable()
+        
+        # Show the window shell now and read the data and history on a worker thread
+        self.view.set_rows([("loading", None)])
+        self.root.update_idletasks()
+        self.startup.mark("first paint")
+        BackgroundTask(root, self.read_data, self.data_loaded, self.data_failed)
+    
+    def read_data(self):
+        """Read the stored places and the history; runs on a worker thread and touches no widgets."""
+        return self.read_places(), History(HISTORY_DIR)
+    
+    def read_places(self):
+        """Return (places, error) read from storage; places is empty if reading failed."""
+        try:
+            return self.watcher.load(), None
+        except Exception as e:
+            return {}, e
+    
+    def data_loaded(self, result):
+        """Install the data read in the background, then show the controls and the rows."""
+        (places, error), history = result
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to load data: {error}")
+        self.history = history
+        self.engine.subscribe(self.history.on_change)
+        self.session_var.set(str(self.history.session))
+        self.load_data(places)
+        for frame, options in self.toolbars:
+            frame.pack(before=self.canvas, **options)
+        self.fill_rows(self.iter_display_rows(), first=True)
+        self.root.after(EXTERNAL_POLL_MS, self.poll_external)
+    
+    def data_failed(self, error):
+        messagebox.showerror("Error", f"Failed to load data: {error}")
+        self.data_loaded((({}, None), History()))
+    
+    def fill_rows(self, rows, first=False):
+        """Lay out the rows RENDER_CHUNK at a time so the first places show before the rest are listed."""
+        chunk = list(itertools.islice(rows, RENDER_CHUNK))
+        if first:
+            self.view.set_rows(chunk)
+            self.startup.mark("interactive")
+        else:
+            self.view.append_rows(chunk)
+        if len(chunk) == RENDER_CHUNK:
+            self.fill_job = self.root.after(1, self.fill_rows, rows)
+        else:
+            self.fill_job = None
+            self.startup.mark("all rows")
+            self.startup.report()
+    
+    def load_data(self, places=None):
+        """Load reputation data into the engine: the given places, or read from storage now."""
+        if places is None:
+            places, error = self.read_places()
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to load data: {error}")
+        if self.storage.lazy:
+            # People are fetched when a place is first expanded, so start collapsed
+            for place in places:
+                self.place_visibility[place] = True
+        try:
+            self.engine.load(places)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Failed to load data: {e}")
+        if self.propagator is not None:
+            self.propagator.reset()
+        self.search.rebuild()
+        self.undo_stack.clear()
+        if not len(self.history):
+            # Start a new timeline from the values as they are now
+            self.history.record_baseline(self.engine.to_dict())
+    
+    def load_people(self, place):
+        """Fetch a place's people for the engine and give the history their starting values."""
+        people = self.storage.load_people(place)
+        self.watcher.loaded_people(place, people)
+        if self.history is not None:
+            self.history.record_people_baseline(place, people)
+        return people
+    
+    def instrument(self):
+        """Register the hot paths with the instruments; they are only wrapped while enabled."""
+        view = self.view
+        widgets = {"widgets_created": lambda: view.created, "widgets_destroyed": lambda: view.destroyed}
+        written = {"bytes_written": lambda: self.storage.bytes_written}
+        self.instruments.watch(self, ["refresh_display", "update_rows", "show_changes", "apply_search"],
+                               probes=widgets)
+        self.instruments.watch(view, ["render"], "view.", widgets)
+        self.instruments.watch(self, ["save_data"], probes=written)
+        self.instruments.watch(self.saver, ["flush"], "saver.", written)
+        self.instruments.watch(self, ["load_data", "modify_place_reputation", "modify_person_reputation",
+                                      "set_place_reputation", "set_person_reputation"])
+    
+    def load_propagator(self):
+        """Set up reputation propagation if a relations file exists."""
+        try:
+            return load_propagator(self.engine, RELATIONS_PATH)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load relations: {e}")
+            return None
     
     def save_data(self):
-        """Save reputation data to file."""
+        """Save a full snapshot of the reputation data (compacts the JSON journal)."""
+        if self.checking:
+            # Snapshotting now would write our side of a conflict the user has not decided yet
+            self.root.after(EXTERNAL_POLL_MS, self.save_data)
+            return
         try:
-            directory = os.path.dirname(FILE_PATH)
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            with open(FILE_PATH, "w") as f:
-                json.dump(self.places, f, indent=4)
+            self.flush_changes()
+            self.merge_before_write()
+            self.storage.snapshot(self.engine.to_dict())
+            self.watcher.wrote([])
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save data: {e}")
     
+    def on_changes(self, records):
+        """Persist and redraw the records of one edit or bulk edit reported by the engine."""
+        if not self.merging:
+            # Merged records came from the file; writing them back would only duplicate them
+            self.log_changes(records)
+        self.show_changes(records)
+    
+    def log_changes(self, records):
+        """Queue change records and schedule the write-behind flush."""
+        self.pending_records.extend(records)
+        self.saver.request()
+    
+    def flush_changes(self):
+        """Write queued change records to storage in one batch, after merging outside changes."""
+        if self.checking:
+            # Fired from the conflict dialog's event loop; write once the user picked a side
+            self.saver.request()
+            return
+        self.merge_before_write()
+        records, self.pending_records = self.pending_records, []
+        try:
+            self.storage.write(records, self.engine.to_dict)
+            self.watcher.wrote(records)
+            self.history.flush()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save data: {e}")
+    
+    def merge_before_write(self):
+        """Merge outside changes right before writing, once more if another save landed meanwhile.
+        
+        A conflict dialog can stay open for a while; a save landing after the
+        second check stays flagged in the watcher and is merged on the next poll.
+        """
+        self.check_external()
+        if self.watcher.before_write():
+            self.check_external()
+            self.watcher.before_write()
+    
+    def poll_external(self):
+        """Merge in changes another machine saved to the data file, then check again later."""
+        self.check_external()
+        self.root.after(EXTERNAL_POLL_MS, self.poll_external)
+    
+    def check_external(self):
+        """Merge changes made to the data file since it was last read or written here.
+        
+        Entries only the other side changed are applied to the engine, so only
+        their rows redraw. Entries both sides changed differently are listed and
+        the user picks which side wins; ours are then written over theirs.
+        
+        The conflict dialog runs a nested event loop. Until the merge is done
+        and the base and queued records match the user's choice, nothing is
+        written and polls do not start a second merge.
+        """
+        if self.checking:
+            return
+        self.checking = True
+        try:
+            self.merge_external()
+        finally:
+            self.checking = False
+    
+    def merge_external(self):
+        try:
+            theirs = self.watcher.poll()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read outside changes: {e}")
+            return
+        if theirs is None:
+            return
+        changes, conflicts = plan_merge(self.watcher.base, EnginePlaces(self.engine), theirs)
+        restated = []
+        # A place they deleted whose people were never loaded here cannot be kept; their deletion stands
+        forced = [conflict for conflict in conflicts if not can_keep_ours(self.engine, conflict)]
+        conflicts = [conflict for conflict in conflicts if can_keep_ours(self.engine, conflict)]
+        note = ""
+        if forced:
+            for conflict in forced:
+                changes.extend(conflict.changes)
+            note = (f"These places were deleted on another machine. Their people were never loaded here, "
+                    f"so they cannot be kept and are deleted here too:\n\n{list_conflicts(forced)}")
+            if not conflicts:
+                messagebox.showinfo("Changed on another machine", note)
+        if conflicts:
+            keep_ours = messagebox.askyesno(
+                "Changed on another machine",
+                f"These entries were also changed on another machine:\n\n{list_conflicts(conflicts)}\n\n"
+                "Keep your values? Choose No to take the other machine's values."
+                + (f"\n\n{note}" if note else ""))
+            for conflict in conflicts:
+                if keep_ours:
+                    restated.extend(restate_records(self.engine, conflict))
+                else:
+                    changes.extend(conflict.changes)
+        self.merging = True
+        try:
+            apply_changes(self.engine, changes)
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to merge outside changes: {e}")
+        finally:
+            self.merging = False
+        self.watcher.accept(theirs)
+        # Queued edits of entries just taken from the file must not overwrite them
+        self.pending_records = superseded(self.pending_records, changes) + restated
+        if restated:
+            self.saver.request()
+    
+    def show_changes(self, records):
+        """Redraw only the rows the change records touched, each once."""
+        rows = set()
+        structural = False
+        for record in records:
+            op = record["op"]
+            if op in ("set_place", "delta_place"):
+                rows.add(("place", record["place"]))
+            elif op in ("set_person", "delta_person"):
+                rows.add(("person", (record["place"], record["person"])))
+            else:
+                structural = True
+                if op == "delete_place":
+                    self.selection.discard(("place", record["place"]))
+                    self.selection = {row for row in self.selection
+                                      if row[0] == "place" or row[1][0] != record["place"]}
+                elif op == "delete_person":
+                    self.selection.discard(("person", (record["place"], record["person"])))
+            if self.propagator is not None and "person" in record:
+                # The place's derived score follows its people
+                rows.add(("place", record["place"]))
+        if structural:
+            if self.search_results is not None:
+                self.search_results = self.search.run(self.search_var.get())
+            self.update_rows()
+            self.update_selection_label()
+        for kind, key in rows:
+            self.view.refresh_row(kind, key)
+    
+    def undo(self):
+        """Revert the last edit or bulk edit."""
+        try:
+            self.undo_stack.undo()
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot undo: {e}")
+    
+    def redo(self):
+        """Apply the last undone edit again."""
+        try:
+            self.undo_stack.redo()
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot redo: {e}")
+    
+    def change_session(self):
+        """Tag the changes that follow with the session number from the top bar."""
+        try:
+            self.history.start_session(int(self.session_var.get()))
+            self.saver.request()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid session: {e}")
+            self.session_var.set(str(self.history.session))
+    
+    def schedule_search(self):
+        """Filter the rows once typing in the search box pauses."""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.apply_search)
+    
+    def apply_search(self):
+        """Show only the places and people matching the search box."""
+        self.search_job = None
+        self.search_results = self.search.run(self.search_var.get())
+        if self.search_results is not None:
+            # Open the places of the matches; lazy places start collapsed
+            for place, people in self.search_results.items():
+                if people:
+                    self.place_visibility[place] = False
+        self.canvas.yview_moveto(0)
+        self.update_rows()
+    
+    def show_history(self):
+        """Open the point-in-time history viewer."""
+        # People of places never expanded have no rows yet; read their starting values so past sessions list them
+        for place in self.engine.place_names():
+            if not self.engine.is_loaded(place):
+                self.history.record_people_baseline(place, self.storage.load_people(place))
+        HistoryWindow(self.root, self.history)
+    
+    def toggle_server(self):
+        """Start or stop serving the data and its changes to players (this machine only unless SERVER_PATH names a host)."""
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+            self.share_btn.configure(text="Share")
+            return
+        try:
+            # Players' edits arrive on the server thread; it asks for them to be applied on this one
+            server = SessionServer(self.engine, notify=lambda: self.root.after_idle(self.apply_player_edits),
+                                   **load_server_config(SERVER_PATH))
+            server.start()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start sharing: {e}")
+            return
+        self.server = server
+        self.share_btn.configure(text=f"Stop Sharing (port {server.port})")
+    
+    def apply_player_edits(self):
+        """Apply the edits players sent; the server schedules this when edits come in."""
+        if self.server is not None:
+            self.server.apply_edits()
+    
+    def on_close(self):
+        """Write any pending edits before the window closes."""
+        if self.server is not None:
+            self.server.stop()
+        self.saver.flush()
+        self.storage.close()
+        self.root.destroy()
+    
     def toggle_visibility(self, place):
         """Toggle the visibility of people for a given place."""
         current = self.place_visibility.get(place, False)
         self.place_visibility[place] = not current
-        self.refresh_display()
+        self.update_rows()
     
-    def refresh_display(self):
-        """Clear and rebuild the display of places and people."""
-        for widget in self.display_frame.winfo_children():
-            widget.destroy()
-        
-        if not self.places:
-            ttk.Label(self.display_frame, text="No places added yet.").pack(pady=10)
+    def display_rows(self):
+        """Flatten places and their shown people into the (kind, key) rows of the view."""
+        return list(self.iter_display_rows())
+    
+    def iter_display_rows(self):
+        if not len(self.engine):
+            yield ("empty", None)
             return
-        
-        for place in self.places:
-            place_frame = ttk.Frame(self.display_frame, relief="ridge", borderwidth=2, padding=10)
-            place_frame.pack(fill=tk.X, padx=5, pady=5)
-            
-            header_frame = ttk.Frame(place_frame)
-            header_frame.pack(fill=tk.X)
-            
-            # Place name label
-            name_label = ttk.Label(header_frame, text=place, style="Header.TLabel")
-            name_label.grid(row=0, column=0, sticky="w")
-            
-            # Reputation controls for the place
-            minus5_btn = ttk.Button(header_frame, text="-5", width=4,
-                                     command=lambda p=place: self.modify_place_reputation(p, -5))
-            minus5_btn.grid(row=0, column=1, padx=2)
-            
-            minus1_btn = ttk.Button(header_frame, text="-1", width=4,
-                                     command=lambda p=place: self.modify_place_reputation(p, -1))
-            minus1_btn.grid(row=0, column=2, padx=2)
-            
-            rep_entry = ttk.Entry(header_frame, width=5, justify="center", font=("Helvetica", 14))
-            rep_entry.insert(0, str(self.places[place]["reputation"]))
-            rep_entry.grid(row=0, column=3, padx=2)
-            rep_entry.bind("<Return>", lambda e, p=place, entry=rep_entry: self.set_place_reputation(p, entry.get()))
-            
-            plus1_btn = ttk.Button(header_frame, text="+1", width=4,
-                                    command=lambda p=place: self.modify_place_reputation(p, 1))
-            plus1_btn.grid(row=0, column=4, padx=2)
-            
-            plus5_btn = ttk.Button(header_frame, text="+5", width=4,
-                                   command=lambda p=place: self.modify_place_reputation(p, 5))
-            plus5_btn.grid(row=0, column=5, padx=2)
-            
-            add_person_btn = ttk.Button(header_frame, text="Add Person",
-                                        command=lambda p=place: self.add_person(p))
-            add_person_btn.grid(row=0, column=6, padx=10)
-            
-            # Toggle visibility button for hiding/showing people in the place
-            toggle_text = "Hide Names" if not self.place_visibility.get(place, False) else "Show Names"
-            toggle_btn = ttk.Button(header_frame, text=toggle_text,
-                                    command=lambda p=place: self.toggle_visibility(p))
-            toggle_btn.grid(row=0, column=7, padx=2)
-            
-            # Delete Place button, placed at the top-right corner of the place_frame
-            delete_place_btn = ttk.Button(place_frame, text="X", style="Delete.TButton", width=1,
-                                          command=lambda p=place: self.delete_place(p))
-            delete_place_btn.place(relx=1, rely=0, anchor="ne", x=-1, y=1)
-            
-            # Only display people if not toggled to hide
+        if self.search_results is not None:
+            yield from self.search_rows()
+            return
+        for place in self.engine.place_names():
+            yield ("place", place)
             if not self.place_visibility.get(place, False):
-                people_frame = ttk.Frame(place_frame, padding="5 5 5 5")
-                people_frame.pack(fill=tk.X, padx=20, pady=5)
-                
-                if not self.places[place]["people"]:
-                    ttk.Label(people_frame, text="No people added yet.").pack(anchor="w")
+                # Lazy storage backends fetch the people here, on first expand
+                people = self.engine.people(place)
+                if people:
+                    yield from (("person", (place, person)) for person in people)
                 else:
-                    for person, rep in self.places[place]["people"].items():
-                        person_frame = ttk.Frame(people_frame)
-                        person_frame.pack(fill=tk.X, pady=2)
-                        
-                        # Delete Person button using pack so it is visible
-                        delete_person_btn = ttk.Button(person_frame, text="X", style="Delete.TButton", width=1,
-                                                       command=lambda p=place, pe=person: self.delete_person(p, pe))
-                        delete_person_btn.pack(side=tk.RIGHT, anchor="ne", padx=2)
-                        
-                        person_details_frame = ttk.Frame(person_frame)
-                        person_details_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                        
-                        person_label = ttk.Label(person_details_frame, text=person)
-                        person_label.grid(row=0, column=0, sticky="w")
-                        
-                        minus5_person = ttk.Button(person_details_frame, text="-5", width=4,
-                                                   command=lambda p=place, pe=person: self.modify_person_reputation(p, pe, -5))
-                        minus5_person.grid(row=0, column=1, padx=2)
-                        
-                        minus1_person = ttk.Button(person_details_frame, text="-1", width=4,
-                                                   command=lambda p=place, pe=person: self.modify_person_reputation(p, pe, -1))
-                        minus1_person.grid(row=0, column=2, padx=2)
-                        
-                        rep_entry_person = ttk.Entry(person_details_frame, width=5, justify="center", font=("Helvetica", 14))
-                        rep_entry_person.insert(0, str(rep))
-                        rep_entry_person.grid(row=0, column=3, padx=2)
-                        rep_entry_person.bind("<Return>", lambda e, p=place, pe=person, entry=rep_entry_person: self.set_person_reputation(p, pe, entry.get()))
-                        
-                        plus1_person = ttk.Button(person_details_frame, text="+1", width=4,
-                                                  command=lambda p=place, pe=person: self.modify_person_reputation(p, pe, 1))
-                        plus1_person.grid(row=0, column=4, padx=2)
-                        
-                        plus5_person = ttk.Button(person_details_frame, text="+5", width=4,
-                                                  command=lambda p=place, pe=person: self.modify_person_reputation(p, pe, 5))
-                        plus5_person.grid(row=0, column=5, padx=2)
+                    yield ("no_people", place)
+    
+    def search_rows(self):
+        """Rows for the current search: matching places, and matching people under their place."""
+        rows = []
+        for place, people in self.search_results.items():
+            rows.append(("place", place))
+            if not self.place_visibility.get(place, False):
+                rows.extend(("person", (place, person)) for person in people)
+        return rows or [("no_matches", None)]
+    
+    def update_rows(self):
+        """Recompute the row list after rows were added, removed, shown or hidden."""
+        filling = self.fill_job is not None
+        if filling:
+            # The full list replaces a startup fill still in progress
+            self.root.after_cancel(self.fill_job)
+            self.fill_job = None
+        self.view.set_rows(self.display_rows())
+        if filling:
+            self.startup.mark("all rows")
+            self.startup.report()
+    
+    def refresh_display(self):
+        """Clear and rebuild the display of places and people.
+        
+        This is the fallback full rebuild; edits go through update_rows() and the
+        keyed row updates below, which only rebind rows that are in view.
+        """
+        self.view.rows = []
+        self.view.reset()
+        self.update_rows()
+    
+    def make_row(self, kind):
+        """Create the reusable widgets for one kind of row; bind_row() fills them in."""
+        row = {"key": None, "kind": kind}
+        if kind == "empty":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="No places added yet.").pack(pady=10)
+            return row
+        if kind == "loading":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="Loading...").pack(pady=10)
+            return row
+        if kind == "no_matches":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="No matches.").pack(pady=10)
+            return row
+        if kind == "no_people":
+            row["frame"] = ttk.Frame(self.canvas)
+            ttk.Label(row["frame"], text="No people added yet.").pack(anchor="w", padx=30)
+            return row
+        if kind == "place":
+            return self.make_place_row(row)
+        return self.make_person_row(row)
+    
+    def make_place_row(self, row):
+        """Create the header widgets of a place row."""
+        place_frame = ttk.Frame(self.canvas, relief="ridge", borderwidth=2, padding=10)
+        
+        # Selection checkbox for bulk edits
+        row["selected"] = tk.BooleanVar()
+        ttk.Checkbutton(place_frame, variable=row["selected"],
+                        command=lambda r=row: self.toggle_selected(r)).pack(side=tk.LEFT)
+        
+        header_frame = ttk.Frame(place_frame)
+        header_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Place name label
+        name_label = ttk.Label(header_frame, style="Header.TLabel")
+        name_label.grid(row=0, column=0, sticky="w")
+        
+        # Reputation controls for the place
+        minus5_btn = ttk.Button(header_frame, text="-5", width=4,
+                                 command=lambda r=row: self.modify_place_reputation(r["key"], -5))
+        minus5_btn.grid(row=0, column=1, padx=2)
+        
+        minus1_btn = ttk.Button(header_frame, text="-1", width=4,
+                                 command=lambda r=row: self.modify_place_reputation(r["key"], -1))
+        minus1_btn.grid(row=0, column=2, padx=2)
+        
+        rep_entry = ttk.Entry(header_frame, width=5, justify="center", font=("Helvetica", 14))
+        rep_entry.grid(row=0, column=3, padx=2)
+        rep_entry.bind("<Return>", lambda e, r=row: self.set_place_reputation(r["key"], r["entry"].get()))
+        
+        plus1_btn = ttk.Button(header_frame, text="+1", width=4,
+                                command=lambda r=row: self.modify_place_reputation(r["key"], 1))
+        plus1_btn.grid(row=0, column=4, padx=2)
+        
+        plus5_btn = ttk.Button(header_frame, text="+5", width=4,
+                               command=lambda r=row: self.modify_place_reputation(r["key"], 5))
+        plus5_btn.grid(row=0, column=5, padx=2)
+        
+        add_person_btn = ttk.Button(header_frame, text="Add Person",
+                                    command=lambda r=row: self.add_person(r["key"]))
+        add_person_btn.grid(row=0, column=6, padx=10)
+        
+        # Toggle visibility button for hiding/showing people in the place
+        toggle_btn = ttk.Button(header_frame, command=lambda r=row: self.toggle_visibility(r["key"]))
+        toggle_btn.grid(row=0, column=7, padx=2)
+        
+        # Delete Place button, placed at the top-right corner of the place_frame
+        delete_place_btn = ttk.Button(place_frame, text="X", style="Delete.TButton", width=1,
+                                      command=lambda r=row: self.delete_place(r["key"]))
+        delete_place_btn.place(relx=1, rely=0, anchor="ne", x=-1, y=1)
+        
+        row.update(frame=place_frame, label=name_label, entry=rep_entry, toggle=toggle_btn)
+        return row
+    
+    def make_person_row(self, row):
+        """Create the widgets of a person row, indented under its place."""
+        person_frame = ttk.Frame(self.canvas, padding="25 2 5 2")
+        
+        # Delete Person button using pack so it is visible
+        delete_person_btn = ttk.Button(person_frame, text="X", style="Delete.TButton", width=1,
+                                       command=lambda r=row: self.delete_person(*r["key"]))
+        delete_person_btn.pack(side=tk.RIGHT, anchor="ne", padx=2)
+        
+        row["selected"] = tk.BooleanVar()
+        ttk.Checkbutton(person_frame, variable=row["selected"],
+                        command=lambda r=row: self.toggle_selected(r)).pack(side=tk.LEFT)
+        
+        person_details_frame = ttk.Frame(person_frame)
+        person_details_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        person_label = ttk.Label(person_details_frame)
+        person_label.grid(row=0, column=0, sticky="w")
+        
+        minus5_person = ttk.Button(person_details_frame, text="-5", width=4,
+                                   command=lambda r=row: self.modify_person_reputation(*r["key"], -5))
+        minus5_person.grid(row=0, column=1, padx=2)
+        
+        minus1_person = ttk.Button(person_details_frame, text="-1", width=4,
+                                   command=lambda r=row: self.modify_person_reputation(*r["key"], -1))
+        minus1_person.grid(row=0, column=2, padx=2)
+        
+        rep_entry_person = ttk.Entry(person_details_frame, width=5, justify="center", font=("Helvetica", 14))
+        rep_entry_person.grid(row=0, column=3, padx=2)
+        rep_entry_person.bind("<Return>", lambda e, r=row: self.set_person_reputation(*r["key"], r["entry"].get()))
+        
+        plus1_person = ttk.Button(person_details_frame, text="+1", width=4,
+                                  command=lambda r=row: self.modify_person_reputation(*r["key"], 1))
+        plus1_person.grid(row=0, column=4, padx=2)
+        
+        plus5_person = ttk.Button(person_details_frame, text="+5", width=4,
+                                  command=lambda r=row: self.modify_person_reputation(*r["key"], 5))
+        plus5_person.grid(row=0, column=5, padx=2)
+        
+        row.update(frame=person_frame, label=person_label, entry=rep_entry_person)
+        return row
+    
+    def bind_row(self, row, kind, key):
+        """Point a reusable row at a place or (place, person) and show its current data."""
+        row["key"] = key
+        if "selected" in row:
+            row["selected"].set((kind, key) in self.selection)
+        if kind == "place":
+            row["label"].configure(text=self.place_title(key))
+            self.set_entry_text(row["entry"], self.engine.place_reputation(key))
+            hidden = self.place_visibility.get(key, False)
+            row["toggle"].configure(text="Show Names" if hidden else "Hide Names")
+        elif kind == "person":
+            place, person = key
+            row["label"].configure(text=person)
+            self.set_entry_text(row["entry"], self.engine.person_reputation(place, person))
+    
+    def place_title(self, place):
+        """Return a place's name, followed by its derived score when propagation is on."""
+        if self.propagator is None or self.propagator.mode is None:
+            return place
+        return f"{place} ({self.propagator.derived_reputation(place)})"
+    
+    def set_entry_text(self, entry, value):
+        """Replace the text of a reputation entry."""
+        entry.delete(0, tk.END)
+        entry.insert(0, str(value))
+    
+    def toggle_selected(self, row):
+        """Add or remove a row's place or person from the bulk-edit selection."""
+        if row["selected"].get():
+            self.selection.add((row["kind"], row["key"]))
+        else:
+            self.selection.discard((row["kind"], row["key"]))
+        self.update_selection_label()
+    
+    def select_shown(self):
+        """Select every place and person currently listed, e.g. all results of a search."""
+        self.selection.update(row for row in self.view.rows if row[0] in ("place", "person"))
+        self.refresh_selection()
+    
+    def clear_selection(self):
+        self.selection.clear()
+        self.refresh_selection()
+    
+    def refresh_selection(self):
+        """Show the selection on the checkboxes in view and in the count label."""
+        for kind, key in list(self.view.visible):
+            self.view.refresh_row(kind, key)
+        self.update_selection_label()
+    
+    def update_selection_label(self):
+        self.selection_label.configure(text=f"{len(self.selection)} selected")
+    
+    def selected_entities(self):
+        """Return the selection as (place, person) pairs, person None for a place; None if nothing is selected."""
+        if not self.selection:
+            messagebox.showerror("Error", "Select places or people first.")
+            return None
+        return [(key, None) if kind == "place" else key for kind, key in self.selection]
+    
+    def bulk_value(self):
+        """Read the integer in the bulk-edit entry, or return None after showing an error."""
+        try:
+            return int(self.bulk_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid integer.")
+            return None
+    
+    def bulk_add(self):
+        """Add the entered amount (may be negative) to every selected reputation."""
+        entities = self.selected_entities()
+        delta = self.bulk_value() if entities else None
+        if delta is not None:
+            self.engine.add_many(entities, delta)
+    
+    def bulk_set(self):
+        """Set every selected reputation to the entered value."""
+        entities = self.selected_entities()
+        value = self.bulk_value() if entities else None
+        if value is None:
+            return
+        if 0 <= value <= 100:
+            self.engine.set_many(entities, value)
+        else:
+            messagebox.showerror("Error", "Reputation must be between 0 and 100.")
+    
+    def bulk_toward(self):
+        """Move every selected reputation part of the way toward the entered value."""
+        entities = self.selected_entities()
+        target = self.bulk_value() if entities else None
+        if target is None:
+            return
+        if not 0 <= target <= 100:
+            messagebox.showerror("Error", "Reputation must be between 0 and 100.")
+            return
+        fraction = simpledialog.askfloat("Scale Toward", f"Move what fraction of the way toward {target}? (0-1)",
+                                         minvalue=0.0, maxvalue=1.0)
+        if fraction is not None:
+            self.engine.scale_toward(entities, target, fraction)
+    
+    def bulk_reset(self):
+        """Reset every selected reputation to 50."""
+        entities = self.selected_entities()
+        if entities:
+            self.engine.set_many(entities, DEFAULT_REPUTATION)
     
     def add_place(self):
         """Prompt user to add a new place."""
         place_name = simpledialog.askstring("Add Place", "Enter place name:")
         if place_name:
-            if place_name in self.places:
+            if self.engine.has_place(place_name):
                 messagebox.showerror("Error", "Place already exists!")
             else:
-                self.places[place_name] = {"reputation": 50, "people": {}}
-                self.save_data()
-                self.refresh_display()
+                self.engine.add_place(place_name)
     
     def add_person(self, place_name):
         """Prompt user to add a new person to a place."""
         person_name = simpledialog.askstring("Add Person", f"Enter person name for {place_name}:")
         if person_name:
-            if person_name in self.places[place_name]["people"]:
+            if self.engine.has_person(place_name, person_name):
                 messagebox.showerror("Error", "Person already exists!")
             else:
-                self.places[place_name]["people"][person_name] = 50
-                self.save_data()
-                self.refresh_display()
+                self.engine.add_person(place_name, person_name)
     
     def delete_place(self, place_name):
         """Delete a place from the tracker."""
         if messagebox.askyesno("Confirm", f"Are you sure you want to delete place '{place_name}'?"):
-            del self.places[place_name]
-            self.save_data()
-            self.refresh_display()
+            self.engine.delete_place(place_name)
     
     def delete_person(self, place_name, person_name):
         """Delete a person from a place."""
         if messagebox.askyesno("Confirm", f"Are you sure you want to delete '{person_name}' from '{place_name}'?"):
-            del self.places[place_name]["people"][person_name]
-            self.save_data()
-            self.refresh_display()
+            self.engine.delete_person(place_name, person_name)
     
     def modify_place_reputation(self, place_name, delta):
         """Modify a place's reputation by delta (±1 or ±5) within 0-100."""
-        current = self.places[place_name]["reputation"]
-        new_value = max(0, min(100, current + delta))
-        self.places[place_name]["reputation"] = new_value
-        self.save_data()
-        self.refresh_display()
+        self.engine.modify_place_reputation(place_name, delta)
     
     def modify_person_reputation(self, place_name, person_name, delta):
         """Modify a person's reputation by delta (±1 or ±5) within 0-100."""
-        current = self.places[place_name]["people"][person_name]
-        new_value = max(0, min(100, current + delta))
-        self.places[place_name]["people"][person_name] = new_value
-        self.save_data()
-        self.refresh_display()
+        self.engine.modify_person_reputation(place_name, person_name, delta)
     
     def set_place_reputation(self, place_name, value_str):
         """Set a place's reputation from a typed value."""
         try:
             value = int(value_str)
             if 0 <= value <= 100:
-                self.places[place_name]["reputation"] = value
-                self.save_data()
-                self.refresh_display()
+                self.engine.set_place_reputation(place_name, value)
             else:
                 messagebox.showerror("Error", "Reputation must be between 0 and 100.")
         except ValueError:
@@ -252,9 +837,7 @@ class ReputationTrackerGUI:
         try:
             value = int(value_str)
             if 0 <= value <= 100:
-                self.places[place_name]["people"][person_name] = value
-                self.save_data()
-                self.refresh_display()
+                self.engine.set_person_reputation(place_name, person_name, value)
             else:
                 messagebox.showerror("Error", "Reputation must be between 0 and 100.")
         except ValueError:
@@ -0,0 +1,248 @@
+import re
+import bisect
+
+from engine import MIN_REPUTATION, MAX_REPUTATION
+
+# Named reputation bands usable in a search, e.g. "hostile" or "friendly guard"
+BANDS = {
+    "hostile": (0, 19),
+    "unfriendly": (20, 39),
+    "neutral": (40, 60),
+    "friendly": (61, 80),
+    "allied": (81, 100),
+}
+
+COMPARISON = re.compile(r"(?:\brep(?:utation)?\s*)?(<=|>=|<|>|=)\s*(\d+)")
+RANGE = re.compile(r"\b(\d+)\s*-\s*(\d+)\b")
+
+
+def parse_query(text):
+    """Split a search into (name text, low, high).
+
+    Reputation filters can be comparisons ("< 20", "rep>=80", "=50"), ranges
+    ("20-40") or band names from BANDS; everything else is name text.
+    """
+    bounds = [MIN_REPUTATION, MAX_REPUTATION]
+
+    def narrow(low, high):
+        bounds[0] = max(bounds[0], low)
+        bounds[1] = min(bounds[1], high)
+
+    def comparison(match):
+        op, value = match.group(1), int(match.group(2))
+        if op == "<":
+            narrow(MIN_REPUTATION, value - 1)
+        elif op == "<=":
+            narrow(MIN_REPUTATION, value)
+        elif op == ">":
+            narrow(value + 1, MAX_REPUTATION)
+        elif op == ">=":
+            narrow(value, MAX_REPUTATION)
+        else:
+            narrow(value, value)
+        return " "
+
+    def value_range(match):
+        narrow(int(match.group(1)), int(match.group(2)))
+        return " "
+
+    text = COMPARISON.sub(comparison, text.lower())
+    text = RANGE.sub(value_range, text)
+    words = []
+    for word in text.split():
+        if word in BANDS:
+            narrow(*BANDS[word])
+        else:
+            words.append(word)
+    return " ".join(words), bounds[0], bounds[1]
+
+
+class NameIndex:
+    """Prefix and substring index over place and person names.
+
+    Entities are (place, None) for a place and (place, person) for a person.
+    Prefix lookups bisect a sorted list of lowercased names; substring lookups
+    intersect trigram posting sets. Both are updated per add/delete, so the
+    index never has to be rebuilt while the app runs.
+    """
+
+    def __init__(self):
+        self.sorted_names = []
+        self.grams = {}
+        self.names = {}
+        self.place_people = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def build(self, engine):
+        """Index every place and every loaded person of an engine; return the places left unloaded."""
+        unloaded = set()
+        for place in engine.place_names():
+            self.index_name(place, None)
+            if engine.is_loaded(place):
+                for person in engine.people(place):
+                    self.index_name(place, person)
+            else:
+                unloaded.add(place)
+        # Sort once instead of inserting every name into place
+        self.sorted_names = sorted((name, place, person or "") for (place, person), name in self.names.items())
+        return unloaded
+
+    def add_people(self, place, people):
+        for person in people:
+            self.add(place, person)
+
+    def add(self, place, person=None):
+        name = self.index_name(place, person)
+        if name is not None:
+            bisect.insort(self.sorted_names, (name, place, person or ""))
+
+    def index_name(self, place, person):
+        """Add an entity to every structure but the sorted list; return its name, or None if already indexed."""
+        entity = (place, person)
+        if entity in self.names:
+            return None
+        name = (place if person is None else person).lower()
+        self.names[entity] = name
+        for gram in trigrams(name):
+            self.grams.setdefault(gram, set()).add(entity)
+        if person is not None:
+            self.place_people.setdefault(place, set()).add(person)
+        return name
+
+    def remove(self, place, person=None):
+        entity = (place, person)
+        name = self.names.pop(entity, None)
+        if name is None:
+            return
+        i = bisect.bisect_left(self.sorted_names, (name, place, person or ""))
+        del self.sorted_names[i]
+        for gram in trigrams(name):
+            postings = self.grams[gram]
+            postings.discard(entity)
+            if not postings:
+                del self.grams[gram]
+        if person is not None:
+            self.place_people[place].discard(person)
+
+    def remove_place(self, place):
+        for person in list(self.place_people.get(place, ())):
+            self.remove(place, person)
+        self.place_people.pop(place, None)
+        self.remove(place)
+
+    def on_change(self, record):
+        """Engine listener keeping the index in step with adds and deletes."""
+        op = record["op"]
+        if op == "add_place":
+            self.add(record["place"])
+        elif op == "add_person":
+            self.add(record["place"], record["person"])
+        elif op == "delete_place":
+            self.remove_place(record["place"])
+        elif op == "delete_person":
+            self.remove(record["place"], record["person"])
+
+    def find(self, text):
+        """Return the entities whose name contains text (starts with it, for 1-2 letters)."""
+        text = text.lower()
+        if len(text) < 3:
+            i = bisect.bisect_left(self.sorted_names, (text,))
+            found = set()
+            while i < len(self.sorted_names) and self.sorted_names[i][0].startswith(text):
+                _, place, person = self.sorted_names[i]
+                found.add((place, person or None))
+                i += 1
+            return found
+        postings = sorted((self.grams.get(gram, ()) for gram in trigrams(text)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {entity for entity in candidates if text in self.names[entity]}
+
+
+def trigrams(name):
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+class Search:
+    """Live filter over an engine's places and people.
+
+    The index is built on the first search, so startup does not pay for it,
+    and then kept current from engine records. People of places a lazy backend
+    has not loaded yet are searched in the backend through find_people (see
+    Storage.find_people); only the places with matches are then loaded into
+    the engine and indexed.
+    """
+
+    def __init__(self, engine, find_people=None):
+        self.engine = engine
+        self.find_people = find_people
+        self.index = None
+        self.unloaded = set()
+        engine.subscribe(self.on_change)
+
+    def rebuild(self):
+        """Drop the index, e.g. after the engine was reloaded; the next search rebuilds it."""
+        self.index = None
+        self.unloaded = set()
+
+    def on_change(self, record):
+        if self.index is None:
+            return
+        self.index.on_change(record)
+        if record["op"] == "delete_place":
+            self.unloaded.discard(record["place"])
+
+    def index_loaded(self):
+        """Index the people of lazy places that were loaded since the last search."""
+        engine = self.engine
+        loaded = [place for place in self.unloaded if engine.is_loaded(place)]
+        for place in loaded:
+            self.unloaded.discard(place)
+            self.index.add_people(place, engine.people(place))
+
+    def run(self, text):
+        """Return {place: [people to show]} for a query, in engine order, or None for an empty query.
+
+        A place is included when its name matches (with all its people in the
+        reputation range) or when any of its people match.
+        """
+        name_text, low, high = parse_query(text)
+        if not name_text and (low, high) == (MIN_REPUTATION, MAX_REPUTATION):
+            return None
+        engine = self.engine
+        if self.index is None:
+            self.index = NameIndex()
+            self.unloaded = self.index.build(engine)
+        if self.unloaded and self.find_people is not None:
+            for place in {place for place, _ in self.find_people(self.unloaded, name_text, low, high)}:
+                engine.load_people(place)
+        if self.unloaded:
+            self.index_loaded()
+        if name_text:
+            matched = self.index.find(name_text)
+        else:
+            matched = self.index.names.keys()
+        matched_places = set()
+        matched_people = {}
+        for place, person in matched:
+            if person is None:
+                if low <= engine.place_reputation(place) <= high:
+                    matched_places.add(place)
+            elif low <= engine.person_reputation(place, person) <= high:
+                matched_people.setdefault(place, set()).add(person)
+
+        result = {}
+        for place in engine.place_names():
+            if place in matched_places:
+                people = engine.people(place) if engine.is_loaded(place) else ()
+                if name_text:
+                    people = [person for person in people if low <= engine.person_reputation(place, person) <= high]
+                else:
+                    people = [person for person in people if person in matched_people.get(place, ())]
+                result[place] = people
+            elif place in matched_people:
+                result[place] = [person for person in engine.people(place) if person in matched_people[place]]
+        return result
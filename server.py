@@ -0,0 +1,383 @@
+"""Local session server: players follow the DM's reputation data live.
+
+The DM's tracker is authoritative. SessionServer mirrors its engine and
+serves newline-delimited JSON over plain TCP from a background thread:
+
+    client -> {"type": "hello", "token": "...", "session": "...", "since": 12}   all optional
+    server -> {"type": "welcome", "role": "read" | "edit", "session": "...", "version": 12}
+    server -> {"type": "snapshot", "version": 12, "places": {...}}    reputation.json layout
+    server -> {"type": "delta", "version": 13, "changes": [[place, person, value], ...]}
+    client -> {"type": "set", "place": p, "person": q, "value": v}    edit role only
+    client -> {"type": "add", "place": p, "person": q, "delta": d}    edit role only
+    client -> {"type": "ping", "id": x}      server -> {"type": "pong", "id": x, "version": v}
+    server -> {"type": "error", "message": "..."}
+
+person is null for a place's own reputation and value null for a deletion.
+Every engine commit becomes one delta with the next version. Versions count
+from 0 again each time the server starts, under a new session id. A client
+that says hello with the session id it was welcomed with and since=N gets
+the buffered deltas after N instead of a snapshot when it can, so a dropped
+connection resumes cheaply; any other client gets a snapshot.
+
+By default the server only listens on this machine; players on the network
+can join once the config names a host such as "0.0.0.0" (see
+load_server_config()).
+
+    python server.py HOST[:PORT] [--token TOKEN]     follow a session from a terminal
+"""
+import sys
+import json
+import hmac
+import queue
+import secrets
+import asyncio
+import argparse
+import threading
+from collections import deque
+
+from engine import DEFAULT_REPUTATION
+
+# Exposing the data to the network is opt-in through the config's "host"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Deltas kept for clients that reconnect with "since"
+DELTA_BACKLOG = 1000
+
+# A client with this many unsent bytes is too slow to follow and is dropped; it can resume with "since"
+MAX_CLIENT_BUFFER = 1 << 20
+
+# Longest message line a client may send, and how long it has to say hello
+MAX_LINE = 64 * 1024
+HELLO_TIMEOUT = 10
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def record_changes(records):
+    """Turn engine change records into [place, person, value] delta entries."""
+    changes = []
+    for record in records:
+        op = record["op"]
+        place = record["place"]
+        if op == "add_place":
+            changes.append([place, None, DEFAULT_REPUTATION])
+        elif op == "delete_place":
+            changes.append([place, None, None])
+        elif op == "delete_person":
+            changes.append([place, record["person"], None])
+        elif op == "add_person":
+            changes.append([place, record["person"], record.get("value", DEFAULT_REPUTATION)])
+        else:
+            changes.append([place, record.get("person"), record["value"]])
+    return changes
+
+
+def apply_change(places, change):
+    """Apply one delta entry to a places dict, as a client's copy of the data would."""
+    place, person, value = change
+    if person is None:
+        if value is None:
+            places.pop(place, None)
+        elif place in places:
+            places[place]["reputation"] = value
+        else:
+            places[place] = {"reputation": value, "people": {}}
+    elif place in places:
+        people = places[place]["people"]
+        if value is None:
+            people.pop(person, None)
+        else:
+            people[person] = value
+
+
+def apply_edit(engine, message):
+    """Apply a client's "set" or "add" message to the engine."""
+    place = message["place"]
+    person = message.get("person")
+    if not engine.has_place(place):
+        raise KeyError(f"Unknown place: {place}")
+    if person is not None and not engine.has_person(place, person):
+        raise KeyError(f"Unknown person: {person}")
+    if message["type"] == "set":
+        value = message["value"]
+        if not isinstance(value, int):
+            raise ValueError("value must be an integer")
+        if person is None:
+            engine.set_place_reputation(place, value)
+        else:
+            engine.set_person_reputation(place, person, value)
+    else:
+        delta = message["delta"]
+        if not isinstance(delta, int):
+            raise ValueError("delta must be an integer")
+        if person is None:
+            engine.modify_place_reputation(place, delta)
+        else:
+            engine.modify_person_reputation(place, person, delta)
+
+
+def load_server_config(path):
+    """Read the server settings; a missing file means defaults: this machine only, anonymous read-only access.
+
+    The file is JSON: {"host": ..., "port": ..., "anonymous": true,
+    "tokens": {"TOKEN": {"role": "read" | "edit", "places": [...]}}}; places
+    limits what an edit token may change and may be left out. "host":
+    "0.0.0.0" serves every network the machine is on.
+    """
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    tokens = config.get("tokens", {})
+    for token, grant in tokens.items():
+        if grant.get("role") not in ("read", "edit"):
+            raise ValueError(f"Token role must be 'read' or 'edit': {token}")
+    return {"host": config.get("host", DEFAULT_HOST), "port": config.get("port", DEFAULT_PORT),
+            "tokens": tokens, "anonymous": config.get("anonymous", True)}
+
+
+class Client:
+    __slots__ = ("writer", "role", "places")
+
+    def __init__(self, writer, role, places):
+        self.writer = writer
+        self.role = role
+        self.places = places
+
+    def may_edit(self, place):
+        return self.role == "edit" and (self.places is None or place in self.places)
+
+
+class SessionServer:
+    """Serve an engine's data and its changes to any number of TCP clients.
+
+    The engine belongs to the Tk thread. Commits reach the server's event
+    loop through call_soon_threadsafe(); the loop keeps its own mirror of the
+    data for snapshots, so it never reads the engine. Client edits go the
+    other way through a queue that the GUI drains with apply_edits(); notify
+    is called once when edits arrive at a drained queue, so an idle server
+    never wakes the Tk thread. Each delta is encoded once and written to
+    every client.
+    """
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, tokens=None, anonymous=True, notify=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.tokens = tokens or {}
+        self.anonymous = anonymous
+        self.edits = queue.Queue()
+        self.notify = notify
+        # Set by the server thread when it called notify, cleared by apply_edits() before draining
+        self.notified = False
+        self.clients = set()
+        # Names this run of the server; a version only means something together with it
+        self.session = secrets.token_hex(8)
+        self.version = 0
+        self.state = None
+        self.backlog = deque(maxlen=DELTA_BACKLOG)
+        self.snapshot_line = (None, None)
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+    def start(self):
+        """Mirror the engine and start serving; raises OSError if the port cannot be bound."""
+        # Players see everyone, so people of lazy storages are loaded once up front
+        for place in self.engine.place_names():
+            self.engine.load_people(place)
+        self.state = self.engine.to_dict()
+        self.engine.subscribe_commits(self.on_commit)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            self.engine.commit_listeners.remove(self.on_commit)
+            self.thread = None
+            raise self.error
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.engine.commit_listeners.remove(self.on_commit)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        loop = self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port, limit=MAX_LINE))
+        except OSError as e:
+            self.error = e
+            loop.close()
+            self.ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            # Closed connections end their handlers; only stragglers are cancelled
+            for client in self.clients:
+                client.writer.close()
+            tasks = asyncio.all_tasks(loop)
+            if tasks:
+                loop.run_until_complete(asyncio.wait(tasks, timeout=1))
+            for task in tasks:
+                task.cancel()
+            loop.close()
+
+    def on_commit(self, records):
+        """Engine commit listener, on the Tk thread: hand the changes to the event loop."""
+        changes = record_changes(records)
+        if changes:
+            self.loop.call_soon_threadsafe(self.publish, changes)
+
+    def publish(self, changes):
+        self.version += 1
+        for change in changes:
+            apply_change(self.state, change)
+        line = encode({"type": "delta", "version": self.version, "changes": changes})
+        self.backlog.append((self.version, line))
+        for client in list(self.clients):
+            self.send(client, line)
+
+    def send(self, client, line):
+        if client.writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            self.clients.discard(client)
+            client.writer.close()
+            return
+        client.writer.write(line)
+
+    def authorize(self, token):
+        """Return (role, places) for a hello token, or None to refuse the client."""
+        if token:
+            for known, grant in self.tokens.items():
+                if hmac.compare_digest(str(token), known):
+                    places = grant.get("places")
+                    return grant["role"], set(places) if places is not None else None
+            return None
+        return ("read", None) if self.anonymous else None
+
+    def catch_up(self, client, session, since):
+        """Send a joining client what it misses: buffered deltas after since, or a snapshot."""
+        backlog = self.backlog
+        if session == self.session and isinstance(since, int) and 0 <= since <= self.version and (
+                since == self.version or (backlog and backlog[0][0] <= since + 1)):
+            for version, line in backlog:
+                if version > since:
+                    client.writer.write(line)
+            return
+        version, line = self.snapshot_line
+        if version != self.version:
+            line = encode({"type": "snapshot", "version": self.version, "places": self.state})
+            self.snapshot_line = (self.version, line)
+        client.writer.write(line)
+
+    async def handle(self, reader, writer):
+        client = None
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), HELLO_TIMEOUT))
+            grant = self.authorize(hello.get("token")) if hello.get("type") == "hello" else None
+            if grant is None:
+                writer.write(encode({"type": "error", "message": "Not allowed"}))
+                return
+            client = Client(writer, *grant)
+            writer.write(encode({"type": "welcome", "role": client.role, "session": self.session,
+                                 "version": self.version}))
+            # No await between catching up and joining, so no delta can slip in between
+            self.catch_up(client, hello.get("session"), hello.get("since"))
+            self.clients.add(client)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.on_message(client, json.loads(line))
+        except (ConnectionError, ValueError, AttributeError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def on_message(self, client, message):
+        kind = message.get("type")
+        if kind == "ping":
+            client.writer.write(encode({"type": "pong", "id": message.get("id"), "version": self.version}))
+        elif kind in ("set", "add"):
+            if not isinstance(message.get("place"), str) or not client.may_edit(message["place"]):
+                client.writer.write(encode({"type": "error", "message": "Not allowed to edit this"}))
+                return
+            self.edits.put((client, message))
+            if not self.notified and self.notify is not None:
+                self.notified = True
+                # Tk waits for its own thread to run a call made from another; a worker keeps the loop serving
+                self.loop.run_in_executor(None, self.notify)
+        else:
+            client.writer.write(encode({"type": "error", "message": f"Unknown message type: {kind}"}))
+
+    def apply_edits(self):
+        """Apply queued client edits to the engine; call it on the thread that owns the engine."""
+        self.notified = False
+        while True:
+            try:
+                client, message = self.edits.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                apply_edit(self.engine, message)
+            except (KeyError, ValueError, TypeError) as e:
+                line = encode({"type": "error", "message": str(e)})
+                self.loop.call_soon_threadsafe(self.send, client, line)
+
+
+async def follow(host, port, token=None):
+    """Print a session's data, then every change as it arrives."""
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 26)
+    writer.write(encode({"type": "hello", "token": token}))
+    places = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            print("Connection closed")
+            return
+        message = json.loads(line)
+        if message["type"] == "snapshot":
+            places = message["places"]
+            for place, data in places.items():
+                print(f"{place}: {data['reputation']}")
+                for person, rep in data["people"].items():
+                    print(f"  {person}: {rep}")
+        elif message["type"] == "delta":
+            for change in message["changes"]:
+                apply_change(places, change)
+                place, person, value = change
+                name = place if person is None else f"{place} / {person}"
+                print(f"v{message['version']} {name}: {'deleted' if value is None else value}")
+        elif message["type"] == "error":
+            print(f"Error: {message['message']}")
+        else:
+            print(f"Joined as {message['role']} at version {message['version']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a reputation tracker session.")
+    parser.add_argument("address", help="HOST or HOST:PORT of the DM's tracker")
+    parser.add_argument("--token", help="access token from the DM")
+    args = parser.parse_args()
+    host, _, port = args.address.partition(":")
+    try:
+        asyncio.run(follow(host, int(port or DEFAULT_PORT), args.token))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import sys
+import time
+import queue
+import threading
+
+
+class BackgroundTask:
+    """Run work() on a worker thread and hand its result back on the Tk thread.
+
+    The worker only puts its result on a queue; the Tk side polls that queue
+    with after(), so on_done(result) and on_error(exception) always run on the
+    thread that owns the widgets.
+    """
+
+    def __init__(self, root, work, on_done, on_error, poll_ms=20):
+        self.root = root
+        self.on_done = on_done
+        self.on_error = on_error
+        self.poll_ms = poll_ms
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, args=(work,), daemon=True)
+        self.thread.start()
+        self.root.after(poll_ms, self.poll)
+
+    def run(self, work):
+        try:
+            self.results.put((True, work()))
+        except Exception as e:
+            self.results.put((False, e))
+
+    def poll(self):
+        try:
+            ok, value = self.results.get_nowait()
+        except queue.Empty:
+            self.root.after(self.poll_ms, self.poll)
+            return
+        if ok:
+            self.on_done(value)
+        else:
+            self.on_error(value)
+
+
+class StartupTimer:
+    """Milestones of a staged startup, in seconds since the timer was created."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - self.start
+
+    def report(self, out=sys.stderr):
+        text = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.marks.items())
+        print(f"Startup: {text}", file=out)
@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import sqlite3
+
+from journal import Journal, journal_path_for, apply_record
+from binsnap import Snapshot, write_snapshot
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+BINARY_EXTENSIONS = (".snap",)
+
+# Integer columns of a places row (id, reputation) and a people row (id, place_id, reputation)
+PLACE_ROW_BYTES = 16
+PERSON_ROW_BYTES = 24
+
+
+class Storage:
+    """Where the trackers load reputation data from and persist edits to.
+
+    load() returns the places dict used by the GUIs. Lazy backends return
+    {"reputation": r, "people": None} for every place and hand out the people
+    of a place through load_people() the first time it is expanded. Edits
+    arrive as the journal records of journal.py. bytes_written is a running
+    total of what write(), snapshot() and replace_all() put on disk.
+    """
+
+    lazy = False
+    bytes_written = 0
+
+    def load(self):
+        raise NotImplementedError
+
+    def load_people(self, place):
+        raise NotImplementedError
+
+    def write(self, records, get_places):
+        """Persist a batch of edit records.
+
+        get_places() returns the in-memory places dict after them, for backends
+        that occasionally need a full snapshot.
+        """
+        raise NotImplementedError
+
+    def snapshot(self, places):
+        """Fold everything written so far into the backend's compact form."""
+
+    def replace_all(self, places):
+        """Overwrite the stored data with a fully loaded places dict."""
+        raise NotImplementedError
+
+    def find_people(self, places, text, low, high):
+        """Yield (place, person) for the stored people of places that match a search.
+
+        text is lowercased name text (see name_matches()), empty to match any
+        name; the reputation must be within low..high. Lazy backends use this
+        to search places the engine has not loaded without loading them.
+        """
+        for place in places:
+            for person, rep in self.load_people(place).items():
+                if low <= rep <= high and name_matches(person, text):
+                    yield place, person
+
+    def watch_paths(self):
+        """Return the files another program may change under us, for sync.ExternalWatcher."""
+        return []
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """The reputation.json snapshot plus its append-only journal."""
+
+    def __init__(self, path, compact_bytes=256 * 1024):
+        self.path = path
+        self.journal = Journal(journal_path_for(path))
+        self.compact_bytes = compact_bytes
+
+    def load(self):
+        places = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                places = json.load(f)
+        for data in places.values():
+            # Hand-written files may leave out the people of a place that has none
+            data.setdefault("people", {})
+        self.journal.replay(places)
+        return places
+
+    def write(self, records, get_places):
+        self.bytes_written += self.journal.append(records)
+        if self.journal.size() > self.compact_bytes:
+            self.snapshot(get_places())
+
+    def snapshot(self, places):
+        self.bytes_written += self.journal.compact(self.path, places)
+
+    def replace_all(self, places):
+        self.snapshot(places)
+
+    def watch_paths(self):
+        return [self.path, self.journal.path]
+
+
+class BinaryStorage(Storage):
+    """Binary snapshot (see binsnap.py) plus the same append-only journal as the JSON backend.
+
+    Place headers come from the memory-mapped snapshot; a place's people are
+    decoded the first time it is expanded, with that place's journal records
+    applied on top.
+    """
+
+    lazy = True
+
+    def __init__(self, path, compact_bytes=256 * 1024):
+        self.path = path
+        self.journal = Journal(journal_path_for(path))
+        self.compact_bytes = compact_bytes
+        self.file = None
+        # place -> journal records of its people since the snapshot
+        self.overlay = {}
+        # Places (re)added by the journal, whose people in the snapshot no longer count
+        self.fresh = set()
+
+    def open_snapshot(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.path):
+            self.file = Snapshot(self.path)
+
+    def load(self):
+        self.open_snapshot()
+        headers = self.file.headers() if self.file is not None else {}
+        places = {place: {"reputation": rep, "people": None} for place, rep in headers.items()}
+        self.overlay = {}
+        self.fresh = set()
+        for record in self.journal.records():
+            op = record["op"]
+            place = record["place"]
+            if op in ("add_place", "delete_place", "set_place", "delta_place"):
+                apply_record(places, record)
+                if op == "add_place":
+                    places[place]["people"] = None
+                    self.overlay[place] = []
+                    self.fresh.add(place)
+                elif op == "delete_place":
+                    self.overlay.pop(place, None)
+                    self.fresh.discard(place)
+            elif place in places:
+                self.overlay.setdefault(place, []).append(record)
+        return places
+
+    def load_people(self, place):
+        people = {}
+        if self.file is not None and place not in self.fresh:
+            people = self.file.people(place)
+        records = self.overlay.get(place)
+        if records:
+            holder = {place: {"reputation": 0, "people": people}}
+            for record in records:
+                apply_record(holder, record)
+        return people
+
+    def write(self, records, get_places):
+        self.bytes_written += self.journal.append(records)
+        if self.journal.size() > self.compact_bytes:
+            self.snapshot(get_places())
+
+    def snapshot(self, places):
+        # Places the caller never expanded still have their people only in the old file
+        places = {place: {"reputation": data["reputation"],
+                          "people": data["people"] if data["people"] is not None else self.load_people(place)}
+                  for place, data in places.items()}
+        if self.file is not None:
+            # A mapped file cannot be replaced on Windows
+            self.file.close()
+            self.file = None
+        self.bytes_written += write_snapshot(self.path, places)
+        self.journal.truncate()
+        self.overlay = {}
+        self.fresh = set()
+        self.open_snapshot()
+
+    def replace_all(self, places):
+        self.snapshot(places)
+
+    def watch_paths(self):
+        return [self.path, self.journal.path]
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SqliteStorage(Storage):
+    """SQLite database with one row per place and per person.
+
+    Place headers are loaded at startup and people are fetched per place, so
+    startup cost follows the number of places rather than the whole campaign.
+    """
+
+    lazy = True
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Startup reads the place headers on a worker thread; after that only the Tk thread uses it
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS places (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    reputation INTEGER NOT NULL DEFAULT 50
+                );
+                CREATE TABLE IF NOT EXISTS people (
+                    id INTEGER PRIMARY KEY,
+                    place_id INTEGER NOT NULL REFERENCES places(id) ON DELETE CASCADE,
+                    name TEXT NOT NULL,
+                    reputation INTEGER NOT NULL DEFAULT 50
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS places_name ON places(name);
+                CREATE UNIQUE INDEX IF NOT EXISTS people_place_name ON people(place_id, name);
+                CREATE INDEX IF NOT EXISTS people_name ON people(name);
+                CREATE INDEX IF NOT EXISTS people_name_nocase ON people(name COLLATE NOCASE);
+            """)
+
+    def load(self):
+        rows = self.conn.execute("SELECT name, reputation FROM places ORDER BY id")
+        return {name: {"reputation": reputation, "people": None} for name, reputation in rows}
+
+    def load_people(self, place):
+        rows = self.conn.execute(
+            "SELECT people.name, people.reputation FROM people JOIN places ON places.id = people.place_id"
+            " WHERE places.name = ? ORDER BY people.id", (place,))
+        return dict(rows)
+
+    def find_people(self, places, text, low, high):
+        # A prefix LIKE is answered from the case-insensitive name index. LIKE only folds
+        # ASCII case, so other text is left to name_matches() alone
+        query = ("SELECT places.name, people.name FROM people JOIN places ON places.id = people.place_id"
+                 " WHERE people.reputation BETWEEN ? AND ?")
+        args = [low, high]
+        if text and text.isascii():
+            pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query += " AND people.name LIKE ? ESCAPE '\\'"
+            args.append(pattern + "%" if len(text) < 3 else "%" + pattern + "%")
+        for place, person in self.conn.execute(query, args):
+            if place in places and name_matches(person, text):
+                yield place, person
+
+    def write(self, records, get_places):
+        # One transaction per batch; every record touches a single row
+        with self.conn:
+            for record in records:
+                self.apply_record(record)
+        self.bytes_written += sum(map(record_bytes, records))
+
+    def apply_record(self, record):
+        op = record["op"]
+        place = record["place"]
+        if op == "add_place":
+            self.conn.execute("INSERT OR REPLACE INTO places (name, reputation) VALUES (?, 50)", (place,))
+        elif op == "delete_place":
+            self.conn.execute("DELETE FROM places WHERE name = ?", (place,))
+        elif op in ("set_place", "delta_place"):
+            self.conn.execute("UPDATE places SET reputation = ? WHERE name = ?", (record["value"], place))
+        elif op == "add_person":
+            self.conn.execute(
+                "INSERT OR REPLACE INTO people (place_id, name, reputation)"
+                " SELECT id, ?, ? FROM places WHERE name = ?", (record["person"], record.get("value", 50), place))
+        elif op == "delete_person":
+            self.conn.execute(
+                "DELETE FROM people WHERE name = ? AND place_id = (SELECT id FROM places WHERE name = ?)",
+                (record["person"], place))
+        elif op in ("set_person", "delta_person"):
+            self.conn.execute(
+                "UPDATE people SET reputation = ? WHERE name = ? AND place_id = (SELECT id FROM places WHERE name = ?)",
+                (record["value"], record["person"], place))
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+
+    def replace_all(self, places):
+        with self.conn:
+            self.conn.execute("DELETE FROM places")
+            for place, data in places.items():
+                cursor = self.conn.execute("INSERT INTO places (name, reputation) VALUES (?, ?)",
+                                           (place, data["reputation"]))
+                self.conn.executemany("INSERT INTO people (place_id, name, reputation) VALUES (?, ?, ?)",
+                                      [(cursor.lastrowid, person, rep) for person, rep in data["people"].items()])
+        self.bytes_written += sum(record_bytes({"place": place}) +
+                                  sum(record_bytes({"place": place, "person": person}) for person in data["people"])
+                                  for place, data in places.items())
+
+    def close(self):
+        self.conn.close()
+
+
+def name_matches(name, text):
+    """The rule of search.NameIndex.find(): ignoring case, 1-2 letters match a prefix, longer text anywhere."""
+    name = name.lower()
+    return name.startswith(text) if len(text) < 3 else text in name
+
+
+def record_bytes(record):
+    """Payload of the row one record writes to SQLite: its name plus 8 bytes per integer column.
+
+    SQLite does not report the pages it writes to Python, so the SQLite
+    backend counts this payload instead.
+    """
+    if "person" in record:
+        return len(record["person"].encode("utf-8")) + PERSON_ROW_BYTES
+    return len(record["place"].encode("utf-8")) + PLACE_ROW_BYTES
+
+
+def open_storage(path):
+    """Pick the backend from the file extension: SQLite for .db/.sqlite, binary for .snap, JSON otherwise."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SqliteStorage(path)
+    if extension in BINARY_EXTENSIONS:
+        return BinaryStorage(path)
+    return JsonStorage(path)
+
+
+def load_all(storage):
+    """Load every place with its people, fetching them per place from lazy backends."""
+    places = storage.load()
+    for place, data in places.items():
+        if data["people"] is None:
+            data["people"] = storage.load_people(place)
+    return places
+
+
+def copy_data(source_path, target_path):
+    """Copy all reputation data between two files, e.g. reputation.json to reputation.db."""
+    source = open_storage(source_path)
+    target = open_storage(target_path)
+    try:
+        target.replace_all(load_all(source))
+    finally:
+        source.close()
+        target.close()
+
+
+if __name__ == "__main__":
+    # Import/export between backends: python storage.py reputation.json reputation.db (or .snap)
+    if len(sys.argv) != 3:
+        print("usage: python storage.py SOURCE TARGET")
+        sys.exit(1)
+    copy_data(sys.argv[1], sys.argv[2])
@@ -0,0 +1,308 @@
+import os
+import hashlib
+from collections import namedtuple
+
+from journal import apply_record
+
+# One entry both sides changed differently since the common base. person is None for the place
+# itself; base/ours/theirs are reputations, None where the entry does not exist. changes are
+# what taking theirs applies.
+Conflict = namedtuple("Conflict", "place person base ours theirs changes")
+
+
+def file_signature(path):
+    """Return (mtime, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path):
+    """Return a hash of a file's content, or None if it does not exist."""
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def copy_places(places):
+    # people stay None for places whose people a lazy storage has not handed out
+    return {place: {"reputation": data["reputation"],
+                    "people": dict(data["people"]) if data["people"] is not None else None}
+            for place, data in places.items()}
+
+
+class EnginePlaces:
+    """The engine's data as a read-only places mapping for plan_merge(), built one place at a time.
+
+    people is None for places whose people the engine has not loaded, like in the base.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get(self, place):
+        engine = self.engine
+        if not engine.has_place(place):
+            return None
+        people = None
+        if engine.is_loaded(place):
+            people = {person: engine.person_reputation(place, person) for person in engine.people(place)}
+        return {"reputation": engine.place_reputation(place), "people": people}
+
+
+def place_changes(place, ours, theirs):
+    """Return the changes that turn our copy of a place into theirs (either may be None)."""
+    if theirs is None:
+        return [(place, None, None)]
+    our_people = ours["people"] if ours is not None else {}
+    changes = []
+    if ours is None or ours["reputation"] != theirs["reputation"]:
+        changes.append((place, None, theirs["reputation"]))
+    if theirs["people"] is None or our_people is None:
+        # People we never loaded are read from the changed file when first used
+        return changes
+    changes.extend((place, person, None) for person in our_people if person not in theirs["people"])
+    changes.extend((place, person, value) for person, value in theirs["people"].items()
+                   if our_people.get(person) != value)
+    return changes
+
+
+def plan_merge(base, ours, theirs):
+    """Three-way merge of places dicts: base is what was on disk when we last read or wrote it.
+
+    ours only needs get(), e.g. an EnginePlaces. Returns (changes, conflicts).
+    changes are (place, person, value) entries - person None for the place's
+    own reputation, value None for a deletion - that bring theirs into ours
+    where only they changed something. Places nobody else touched are skipped
+    with one dict comparison, so the cost follows what changed on disk.
+    """
+    changes = []
+    conflicts = []
+    for place in list(theirs) + [place for place in base if place not in theirs]:
+        b = base.get(place)
+        t = theirs.get(place)
+        if b == t:
+            continue
+        o = ours.get(place)
+        if o == t:
+            continue
+        if o == b:
+            changes.extend(place_changes(place, o, t))
+        elif o is None or t is None:
+            conflicts.append(Conflict(place, None, b and b["reputation"], o and o["reputation"],
+                                      t and t["reputation"], place_changes(place, o, t)))
+        else:
+            b = b or {"reputation": None, "people": {}}
+            entries = [(None, b["reputation"], o["reputation"], t["reputation"])]
+            if None not in (b["people"], o["people"], t["people"]):
+                people = list(t["people"]) + [person for person in b["people"] if person not in t["people"]]
+                entries.extend((person, b["people"].get(person), o["people"].get(person), t["people"].get(person))
+                               for person in people)
+            for person, bv, ov, tv in entries:
+                if bv == tv or ov == tv:
+                    continue
+                if ov == bv:
+                    changes.append((place, person, tv))
+                else:
+                    conflicts.append(Conflict(place, person, bv, ov, tv, [(place, person, tv)]))
+    return changes, conflicts
+
+
+def apply_changes(engine, changes):
+    """Apply merge changes to the engine as one commit, flagged as replaying."""
+    engine.replaying = True
+    try:
+        with engine.transaction():
+            for place, person, value in changes:
+                if person is None:
+                    if value is None:
+                        if engine.has_place(place):
+                            engine.delete_place(place)
+                        continue
+                    if not engine.has_place(place):
+                        engine.add_place(place)
+                    if engine.place_reputation(place) != value:
+                        engine.set_place_reputation(place, value)
+                elif not engine.has_person(place, person):
+                    if value is not None:
+                        engine.add_person(place, person, value)
+                elif value is None:
+                    engine.delete_person(place, person)
+                elif engine.person_reputation(place, person) != value:
+                    engine.set_person_reputation(place, person, value)
+    finally:
+        engine.replaying = False
+
+
+def restate_records(engine, conflict):
+    """Journal records that write our side of a conflict over theirs."""
+    place, person = conflict.place, conflict.person
+    if person is not None:
+        if conflict.ours is None:
+            return [{"op": "delete_person", "place": place, "person": person}]
+        op = "add_person" if conflict.theirs is None else "set_person"
+        return [{"op": op, "place": place, "person": person, "value": conflict.ours}]
+    if conflict.ours is None:
+        return [{"op": "delete_place", "place": place}]
+    records = [{"op": "set_place", "place": place, "value": conflict.ours}]
+    if conflict.theirs is None:
+        records.insert(0, {"op": "add_place", "place": place})
+        records.extend({"op": "add_person", "place": place, "person": person,
+                        "value": engine.person_reputation(place, person)} for person in engine.people(place))
+    return records
+
+
+def can_keep_ours(engine, conflict):
+    """False for a place the other side deleted whose people were never loaded here.
+
+    Their file no longer has those people, so writing our side back would
+    re-add the place without them; only their deletion can be taken.
+    """
+    return conflict.person is not None or conflict.theirs is not None or engine.is_loaded(conflict.place)
+
+
+def superseded(records, changes):
+    """Drop the records of entries that changes overwrote, so a later flush does not write them back."""
+    keys = {(place, person) for place, person, _ in changes}
+    return [record for record in records if (record["place"], record.get("person")) not in keys]
+
+
+def describe_conflict(conflict):
+    def show(value):
+        return "deleted" if value is None else str(value)
+    name = conflict.place if conflict.person is None else f"{conflict.place} / {conflict.person}"
+    return f"{name}: yours {show(conflict.ours)}, theirs {show(conflict.theirs)}"
+
+
+def list_conflicts(conflicts, limit=10):
+    """Describe conflicts one per line for a dialog, at most limit of them."""
+    listed = "\n".join(describe_conflict(conflict) for conflict in conflicts[:limit])
+    if len(conflicts) > limit:
+        listed += f"\n... and {len(conflicts) - limit} more"
+    return listed
+
+
+class ExternalWatcher:
+    """Notice when another program - e.g. a sync client - changes the data files.
+
+    poll() only stats the files; a file whose mtime or size moved is hashed,
+    and only a changed hash makes it read the data again. base is the data as
+    this process last read or wrote it, the common ancestor for plan_merge().
+    Storages that do not name files to watch are never polled.
+
+    With a lazy storage, base holds the people of a place only once the
+    engine loaded them (see loaded_people()); the people of other places are
+    not merged but read from the changed file when the place is expanded.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.paths = storage.watch_paths()
+        self.files = {}
+        self.base = None
+        # Files that changed under us right before our last write, found by before_write()
+        self.moved = set()
+
+    def load(self):
+        """Read the data through the storage and remember it as the base."""
+        # Fingerprint first: a change landing during the read shows up on the next poll
+        self.fingerprint()
+        places = self.storage.load()
+        if self.paths:
+            self.base = copy_places(places)
+        return places
+
+    def fingerprint(self):
+        for path in self.paths:
+            self.files[path] = (file_signature(path), file_digest(path))
+
+    def changed_paths(self):
+        """Return the watched files whose content changed since last seen, and remember them as seen."""
+        changed = []
+        for path in self.paths:
+            signature = file_signature(path)
+            old_signature, old_digest = self.files.get(path, (None, None))
+            if signature == old_signature:
+                continue
+            digest = file_digest(path)
+            self.files[path] = (signature, digest)
+            if digest != old_digest:
+                changed.append(path)
+        return changed
+
+    def poll(self):
+        """Return the places on disk if someone else changed them since we last looked, else None."""
+        if self.base is None:
+            return None
+        changed = self.changed_paths()
+        if not changed:
+            return None
+        try:
+            places = self.storage.load()
+            if self.storage.lazy:
+                # Compare the people we hold; places new to us come with theirs
+                for place, data in places.items():
+                    known = self.base.get(place)
+                    if data["people"] is None and (known is None or known["people"] is not None):
+                        data["people"] = self.storage.load_people(place)
+            return places
+        except ValueError:
+            # Caught mid-sync with a half-written file; look again on the next poll
+            for path in changed:
+                self.files.pop(path, None)
+            return None
+
+    def loaded_people(self, place, people):
+        """Add the people a lazy storage just handed out for a place to the base."""
+        known = self.base.get(place) if self.base is not None else None
+        if known is not None and known["people"] is None:
+            known["people"] = dict(people)
+
+    def accept(self, places):
+        """Make places, just merged in, the new base."""
+        self.base = copy_places(places)
+
+    def before_write(self):
+        """Call right before this process writes; return True if a watched file changed since last seen.
+
+        wrote() leaves such files flagged, so the next poll() still reads and
+        merges what the other machine saved instead of taking it for ours.
+        """
+        self.moved = set()
+        for path in self.paths:
+            signature = file_signature(path)
+            old_signature, old_digest = self.files.get(path, (None, None))
+            if signature == old_signature:
+                continue
+            digest = file_digest(path)
+            if digest == old_digest:
+                self.files[path] = (signature, digest)
+            else:
+                self.moved.add(path)
+        return bool(self.moved)
+
+    def wrote(self, records):
+        """Account for this process's own write of records (none for a snapshot of the base)."""
+        if self.base is None:
+            return
+        for record in records:
+            known = self.base.get(record["place"])
+            if "person" in record and known is not None and known["people"] is None:
+                # Only reachable for people we never loaded, which the base does not hold
+                continue
+            apply_record(self.base, record)
+        # Only the files the write touched are hashed again
+        for path in self.paths:
+            if path in self.moved:
+                continue
+            signature = file_signature(path)
+            if signature != self.files.get(path, (None, None))[0]:
+                self.files[path] = (signature, file_digest(path))
+        self.moved = set()
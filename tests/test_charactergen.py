@@ -0,0 +1,22 @@
+import json
+
+import charactergen
+from prompt_templates import CACHE_ENTRIES
+
+
+def test_cache_file_holds_a_roster_larger_than_the_default_size(tmp_path, capsys):
+    count = CACHE_ENTRIES * 2
+    specs = tmp_path / "roster.jsonl"
+    with open(specs, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"additional_features": f"NPC number {i}"}) + "\n")
+    args = ["--input", str(specs), "--output", str(tmp_path / "prompts.jsonl"),
+            "--cache", str(tmp_path / "cache.json"), "--stats"]
+
+    charactergen.main(args)
+    capsys.readouterr()
+    charactergen.main(args)
+    stats = json.loads(capsys.readouterr().err.splitlines()[-1])
+
+    assert stats["hits"] == count
+    assert stats["misses"] == 0
@@ -0,0 +1,100 @@
+from collections import deque
+
+# Undo steps kept by default; each step holds only the records of one commit
+UNDO_LIMIT = 500
+
+
+class UndoStack:
+    """Multi-level undo/redo built from the engine's change records.
+
+    Each engine commit - one edit, or one bulk edit with its ripples - is one
+    undo step, stored as the commit's records. Records carry the values they
+    replaced ("old", and the removed people for delete_place), so undoing a
+    step applies the inverse operations and memory grows only with what
+    changed, never with the size of the campaign. Undoing a step commits the
+    inverse records, which become the redo step, and vice versa.
+
+    Undoing a place deletion adds the place back at the end of the list, the
+    same place a new place goes; the storage backends keep places in the
+    order they were added, so an undone deletion stays where it reappears
+    after a restart too.
+    """
+
+    def __init__(self, engine, limit=UNDO_LIMIT):
+        self.engine = engine
+        self.undo_steps = deque(maxlen=limit)
+        self.redo_steps = deque(maxlen=limit)
+        self.replaying = None
+        engine.subscribe_commits(self.on_commit)
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+
+    def on_commit(self, records):
+        if self.replaying == "undo":
+            self.redo_steps.append(records)
+        elif self.replaying == "redo":
+            self.undo_steps.append(records)
+        elif self.engine.replaying:
+            # Edits merged in from another machine are not ours to undo
+            return
+        else:
+            self.undo_steps.append(records)
+            self.redo_steps.clear()
+
+    def undo(self):
+        """Revert the most recent step; return False if there is none."""
+        return self.replay(self.undo_steps, "undo")
+
+    def redo(self):
+        """Apply the most recently undone step again; return False if there is none."""
+        return self.replay(self.redo_steps, "redo")
+
+    def replay(self, steps, direction):
+        if not steps:
+            return False
+        records = steps.pop()
+        engine = self.engine
+        self.replaying = direction
+        engine.replaying = True
+        try:
+            with engine.transaction():
+                for record in reversed(records):
+                    self.invert(record)
+        except (KeyError, ValueError):
+            # The data no longer matches the recorded steps; they cannot be replayed safely
+            self.clear()
+            raise
+        finally:
+            self.replaying = None
+            engine.replaying = False
+        return True
+
+    def invert(self, record):
+        """Apply the operation that undoes one record."""
+        engine = self.engine
+        op = record["op"]
+        place = record["place"]
+        if op == "add_place":
+            engine.delete_place(place)
+        elif op == "delete_place":
+            # Restored at the end of the list, where every backend also puts it
+            engine.add_place(place)
+            engine.set_place_reputation(place, record["old"])
+            for person, value in record["people"].items():
+                engine.add_person(place, person, value)
+        elif op == "add_person":
+            engine.delete_person(place, record["person"])
+        elif op == "delete_person":
+            engine.add_person(place, record["person"], record["old"])
+        elif op in ("set_place", "delta_place"):
+            engine.set_place_reputation(place, record["old"])
+        else:
+            engine.set_person_reputation(place, record["person"], record["old"])
@@ -0,0 +1,129 @@
+import bisect
+
+
+class VirtualList:
+    """Scrollable list of keyed rows on a canvas that only materializes visible rows.
+
+    Rows are (kind, key) pairs with a fixed height per kind. Widgets for a kind
+    are created by make_row(kind), filled for a key by bind_row(row, kind, key),
+    and recycled through a per-kind pool as they scroll out of view.
+    """
+
+    def __init__(self, canvas, scrollbar, row_heights, make_row, bind_row, overscan=4):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.row_heights = row_heights
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.overscan = overscan
+
+        self.rows = []
+        self.offsets = [0]
+        # (kind, key) -> [row, canvas item, y] for every materialized row
+        self.visible = {}
+        self.pool = {kind: [] for kind in row_heights}
+        self.width = 1
+        # Running counts of row widgets built and destroyed, read by the instrumentation
+        self.created = 0
+        self.destroyed = 0
+
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+        self.canvas.bind("<Configure>", self.on_resize)
+
+    def set_rows(self, rows):
+        """Replace the ordered list of (kind, key) rows and redraw what is visible."""
+        self.rows = rows
+        self.offsets = [0]
+        for kind, _ in rows:
+            self.offsets.append(self.offsets[-1] + self.row_heights[kind])
+        self.canvas.configure(scrollregion=(0, 0, self.width, self.offsets[-1]))
+        self.render()
+
+    def append_rows(self, rows):
+        """Add rows after the current ones, e.g. while a long list is filled in chunks."""
+        self.rows.extend(rows)
+        for kind, _ in rows:
+            self.offsets.append(self.offsets[-1] + self.row_heights[kind])
+        self.canvas.configure(scrollregion=(0, 0, self.width, self.offsets[-1]))
+        self.render()
+
+    def visible_range(self):
+        """Return the [first, last) row indices in view, widened by the overscan."""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, bisect.bisect_right(self.offsets, top) - 1 - self.overscan)
+        last = min(len(self.rows), bisect.bisect_left(self.offsets, bottom) + self.overscan)
+        return first, last
+
+    def render(self):
+        """Materialize the rows in view, recycling widgets of rows that left it."""
+        first, last = self.visible_range()
+        wanted = self.rows[first:last]
+        wanted_set = set(wanted)
+        for row_key in [row_key for row_key in self.visible if row_key not in wanted_set]:
+            self.release(row_key)
+        for i, row_key in enumerate(wanted, first):
+            y = self.offsets[i]
+            slot = self.visible.get(row_key)
+            if slot is None:
+                self.acquire(row_key, y)
+            elif slot[2] != y:
+                self.canvas.coords(slot[1], 0, y)
+                slot[2] = y
+
+    def acquire(self, row_key, y):
+        """Take a pooled (or new) row for row_key, bind it and show it at y."""
+        kind, key = row_key
+        pool = self.pool[kind]
+        if pool:
+            row, item = pool.pop()
+            self.canvas.coords(item, 0, y)
+            self.canvas.itemconfigure(item, state="normal", width=self.width)
+        else:
+            row = self.make_row(kind)
+            self.created += 1
+            item = self.canvas.create_window((0, y), window=row["frame"], anchor="nw",
+                                             width=self.width, height=self.row_heights[kind])
+        self.bind_row(row, kind, key)
+        self.visible[row_key] = [row, item, y]
+
+    def release(self, row_key):
+        """Hide a materialized row and return its widgets to the pool."""
+        row, item, _ = self.visible.pop(row_key)
+        self.canvas.itemconfigure(item, state="hidden")
+        self.pool[row_key[0]].append((row, item))
+
+    def refresh_row(self, kind, key):
+        """Rebind one row if it is materialized; rows out of view are bound when scrolled to."""
+        slot = self.visible.get((kind, key))
+        if slot is not None:
+            self.bind_row(slot[0], kind, key)
+
+    def reset(self):
+        """Destroy every pooled and visible widget and rebuild the rows in view."""
+        for row, item, _ in self.visible.values():
+            row["frame"].destroy()
+            self.canvas.delete(item)
+            self.destroyed += 1
+        for pool in self.pool.values():
+            for row, item in pool:
+                row["frame"].destroy()
+                self.canvas.delete(item)
+                self.destroyed += 1
+            pool.clear()
+        self.visible = {}
+        self.render()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.render()
+
+    def on_resize(self, event):
+        self.width = event.width
+        for _, item, _ in self.visible.values():
+            self.canvas.itemconfigure(item, width=self.width)
+        for pool in self.pool.values():
+            for _, item in pool:
+                self.canvas.itemconfigure(item, width=self.width)
+        self.canvas.configure(scrollregion=(0, 0, self.width, self.offsets[-1]))
+        self.render()